@@ -35,6 +35,12 @@ async def check_memory_engine():
 
 async def check_embeddings_server():
     try:
+        from memory.chroma_store import get_embeddings, EMBEDDING_MODE
+        if EMBEDDING_MODE == "local":
+            # in-process model: loading it here doubles as the warm-up
+            await asyncio.to_thread(get_embeddings().load)
+            return True
+
         url = config.get("EMBEDDING_SERVER_BASE_URL", "http://localhost:2000")
         async with httpx.AsyncClient(timeout=2.0) as client:
             res = await client.get(f"{url.replace('/v1','')}/health")
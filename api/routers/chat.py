@@ -1,24 +1,17 @@
 # api/routers/chat.py
 
 from fastapi import APIRouter, Request
-from core.llm import LLM
-import yaml
+from core.llm import get_llm
 import json
-import asyncio
 from fastapi.responses import StreamingResponse
 router = APIRouter()
-brain = LLM()
 
-with open("config.yaml", "r") as file:
-    config = yaml.safe_load(file) or {}
-
-async def stream_generator(user_input: str):
+async def stream_generator(user_input: str, thread_id: str):
     try:
         full_text = ""
 
-        for chunk in brain.generate_chunks(user_input, config["USER_ID"]):
+        async for chunk in get_llm().agenerate_chunks(user_input, thread_id):
             full_text += str(chunk)
-            await asyncio.sleep(0)
 
         # 👇 FRONTEND expects {"text": "..."}
         yield json.dumps({"text": full_text})
@@ -30,8 +23,10 @@ async def stream_generator(user_input: str):
 async def stream(request: Request):
     body = await request.json()
     user = body.get("command", "")
+    # optional per-client conversation, see get_llm().thread_id
+    thread_id = get_llm().thread_id(body.get("session_id") or request.headers.get("x-session-id"))
 
     return StreamingResponse(
-        stream_generator(user),
+        stream_generator(user, thread_id),
         media_type="application/json"
     )
\ No newline at end of file
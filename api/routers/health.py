@@ -1,8 +1,9 @@
 from fastapi import APIRouter
 from core import main
 import httpx
-from memory.chroma_store import get_client
+from memory.chroma_store import get_client, get_embeddings, EMBEDDING_MODE
 from api.routers.tts import get_tts_status
+from debug.tracing import get_tracer
 
 router = APIRouter()
 
@@ -23,9 +24,15 @@ def check_chroma():
 # Embeddings Server (REAL CHECK)
 # =========================
 async def check_embeddings():
+    if EMBEDDING_MODE == "local":
+        # in-process model: no server to ask, report whether it loaded
+        state = get_embeddings().status()
+        return {"loaded": "Online", "failed": "Offline"}.get(state, "Idle")
+
     try:
+        base_url = get_embeddings().base_url.rstrip("/").removesuffix("/v1")
         async with httpx.AsyncClient(timeout=2.0) as client:
-            r = await client.get("http://127.0.0.1:2000/health")
+            r = await client.get(f"{base_url}/health")
             if r.status_code == 200:
                 data = r.json()
                 if data.get("status") == "healthy":
@@ -92,8 +99,19 @@ async def system_health():
     return {
         "llmStatus": llm_status,
         "embeddingsServer": embeddings_status,
+        "embeddingsMode": EMBEDDING_MODE,
         "chromaDb": chroma_status,
         "judgeModel": judge_status,
         "ttsMode": tts_mode,
         "stt": stt_status,
-    }
\ No newline at end of file
+    }
+
+@router.get("/latency")
+async def latency():
+    """Rolling p50/p95 (ms) per agent span: middleware hooks, model calls, tools, whole turns."""
+    return get_tracer().summary()
+
+@router.get("/embeddings")
+async def embeddings_cache():
+    """Embedding cache hit rate, coalesced lookups and batch sizes (plus model state in local mode)."""
+    return get_embeddings().stats()
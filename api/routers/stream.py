@@ -2,43 +2,129 @@
 
 from fastapi import APIRouter, Request
 from fastapi.responses import StreamingResponse
-from core.llm import LLM
+from core.llm import get_llm
 import json
-import asyncio
-import yaml
+import zlib
 
 router = APIRouter()
-brain = LLM()
 
-with open("config.yaml", "r") as file:
-    config = yaml.safe_load(file) or {}
+# Protocol 1: every line carries the full text so far (original format).
+# Protocol 2: every line carries only the new delta, numbered by "seq".
+#   - a "sync" frame every CHECKSUM_EVERY deltas with the byte length and
+#     CRC32 of the text so far, so clients can verify what they rebuilt
+#   - a "snapshot" frame every SNAPSHOT_EVERY deltas with the full text,
+#     so a client that lost frames can resync without restarting
+#   - the closing "done" frame carries the final length and CRC32
+#   - NDJSON frames name their kind in "type" (delta/sync/snapshot/done/error);
+#     SSE carries it in the event line
+PROTOCOL_FULL = 1
+PROTOCOL_DELTA = 2
+
+CHECKSUM_EVERY = 32
+SNAPSHOT_EVERY = 256
+
+SSE_MEDIA_TYPE = "text/event-stream"
+
+
+def _dumps(frame: dict) -> str:
+    return json.dumps(frame, ensure_ascii=False, separators=(",", ":"))
+
+
+def _ndjson(event: str, frame: dict) -> str:
+    if frame.get("v") == PROTOCOL_DELTA:
+        frame = {"type": event, **frame}   # protocol 1 lines stay as they were
+    return _dumps(frame) + "\n"
+
+
+def _sse(event: str, frame: dict) -> str:
+    seq = frame.get("seq")
+    head = f"id: {seq}\n" if seq is not None else ""
+    return f"{head}event: {event}\ndata: {_dumps(frame)}\n\n"
+
+
+async def full_text_frames(user_input: str, thread_id: str):
+    """Protocol 1: (event, frame) pairs carrying the accumulated text."""
+    full = ""
+    async for chunk in get_llm().agenerate_chunks(user_input, thread_id):
+        full += str(chunk)
+        yield "text", {"text": full}
+
+    # optional explicit done message
+    yield "done", {"done": True}
+
+
+async def delta_frames(user_input: str, thread_id: str):
+    """Protocol 2: (event, frame) pairs carrying deltas, checksums and snapshots."""
+    seq = 0
+    size = 0
+    crc = 0
+    parts = []
+
+    async for chunk in get_llm().agenerate_chunks(user_input, thread_id):
+        delta = str(chunk)
+        if not delta:
+            continue
+
+        data = delta.encode("utf-8")
+        size += len(data)
+        crc = zlib.crc32(data, crc)    # running CRC, no rehash of the whole text
+        parts.append(delta)
+        seq += 1
+
+        yield "delta", {"v": PROTOCOL_DELTA, "seq": seq, "delta": delta}
+
+        if seq % SNAPSHOT_EVERY == 0:
+            parts = ["".join(parts)]
+            yield "snapshot", {"v": PROTOCOL_DELTA, "seq": seq, "text": parts[0],
+                               "bytes": size, "crc32": crc}
+        elif seq % CHECKSUM_EVERY == 0:
+            yield "sync", {"v": PROTOCOL_DELTA, "seq": seq, "bytes": size, "crc32": crc}
+
+    yield "done", {"v": PROTOCOL_DELTA, "seq": seq, "done": True, "bytes": size, "crc32": crc}
+
+
+async def stream_generator(user_input: str, thread_id: str, protocol: int = PROTOCOL_FULL, sse: bool = False):
+    frames = delta_frames if protocol == PROTOCOL_DELTA else full_text_frames
+    encode = _sse if sse else _ndjson
 
-async def stream_generator(user_input: str):
     try:
-        full = ""
-        for chunk in brain.generate_chunks(user_input, config["USER_ID"]):
-            full += str(chunk)
-            yield json.dumps({
-                "text": full
-            }) + "\n"
-            await asyncio.sleep(0)
-            print("RAW CHUNK:", repr(chunk))
-
-        # optional explicit done message
-        yield json.dumps({"done": True}) + "\n"
+        async for event, frame in frames(user_input, thread_id):
+            yield encode(event, frame)
     except Exception as e:
-        yield json.dumps({"error": str(e)}) + "\n"
+        error = {"error": str(e)}
+        if protocol == PROTOCOL_DELTA:
+            error = {"v": PROTOCOL_DELTA, **error}
+        yield encode("error", error)
+
 
 @router.post("")
 async def stream(request: Request):
+    """
+    Body: {"command": "...", "session_id": "...", "protocol": 1|2, "transport": "ndjson"|"sse"}
+
+    session_id (or an X-Session-Id header) gives the client its own
+    conversation; without it all clients share the USER_ID thread.
+    SSE is also chosen when the client sends Accept: text/event-stream.
+    """
     body = await request.json()
     user = body.get("command", "")
+    thread_id = get_llm().thread_id(body.get("session_id") or request.headers.get("x-session-id"))
+
+    try:
+        protocol = int(body.get("protocol", PROTOCOL_FULL))
+    except (TypeError, ValueError):
+        protocol = PROTOCOL_FULL
+
+    transport = str(body.get("transport", "")).lower()
+    sse = transport == "sse" or (
+        not transport and SSE_MEDIA_TYPE in request.headers.get("accept", "")
+    )
 
     return StreamingResponse(
-        stream_generator(user),
-        media_type="application/x-ndjson",
+        stream_generator(user, thread_id, protocol, sse),
+        media_type=SSE_MEDIA_TYPE if sse else "application/x-ndjson",
         headers={
             "Cache-Control": "no-cache",
             "Connection": "keep-alive",
         }
-    )
\ No newline at end of file
+    )
@@ -1,12 +1,22 @@
 from stt.stt import STT
-from fastapi import APIRouter, HTTPException
+from stt.scheduler import get_transcription_scheduler, TranscriptionQueueFull
+from stt.streaming import StreamingTranscriber
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
 import asyncio
+import json
 from concurrent.futures import ThreadPoolExecutor
 from pydantic import BaseModel
 import base64
 import uuid
 import time
 import logging
+import yaml
+
+with open("config.yaml", "r") as f:
+    config = yaml.safe_load(f) or {}
+
+# Dump every uploaded clip to /tmp (off by default)
+SAVE_DEBUG_AUDIO = bool((config.get("STT", {}) or {}).get("SAVE_DEBUG_AUDIO", False))
 
 logger = logging.getLogger("stt")
 logger.setLevel(logging.DEBUG)
@@ -15,7 +25,25 @@ router = APIRouter()
 
 stt = STT(mode='normal')
 
+# Microphone capture only (one physical mic → one worker).
+# Uploaded audio goes through the transcription scheduler instead.
 executor = ThreadPoolExecutor(max_workers=1)
+scheduler = get_transcription_scheduler()
+
+
+async def transcribe_upload(audio_bytes):
+    """
+    Run an upload through the shared scheduler without blocking the
+    event loop. Answers 429 with Retry-After when the queue is full.
+    """
+    try:
+        return await scheduler.transcribe(audio_bytes)
+    except TranscriptionQueueFull as e:
+        raise HTTPException(
+            status_code=429,
+            detail="STT is busy, try again shortly",
+            headers={"Retry-After": str(e.retry_after)},
+        )
 
 
 from fastapi import UploadFile, File
@@ -37,7 +65,7 @@ async def stt_health():
         if hasattr(stt, "running") and not stt.running:
             return {"status": "Offline"}
 
-        return {"status": "Listening"}
+        return {"status": "Listening", "scheduler": scheduler.stats()}
 
     except Exception as e:
         print("STT HEALTH ERROR:", e)
@@ -46,8 +74,8 @@ async def stt_health():
 @router.post("/file")
 async def stt_from_file(file: UploadFile = File(...)):
     audio_bytes = await file.read()
-    text = stt.transcribe_for_api(audio_bytes)
-    return {"text": text}
+    result = await transcribe_upload(audio_bytes)
+    return {"text": result["text"]}
 
 @router.post("/")
 async def stt_endpoint():
@@ -111,17 +139,19 @@ async def stt_from_json(req: STTJsonRequest):
         logger.debug(f"[{req_id}] Decoded bytes size: {len(audio_bytes)} bytes")
 
         # OPTIONAL: Write incoming audio to disk for debugging
-        try:
-            debug_path = f"/tmp/stt_{req_id}.wav"
-            with open(debug_path, "wb") as f:
-                f.write(audio_bytes)
-            logger.info(f"[{req_id}] Saved debug audio: {debug_path}")
-        except Exception as save_err:
-            logger.warning(f"[{req_id}] Failed to save debug audio: {save_err}")
+        if SAVE_DEBUG_AUDIO:
+            try:
+                debug_path = f"/tmp/stt_{req_id}.wav"
+                with open(debug_path, "wb") as f:
+                    f.write(audio_bytes)
+                logger.info(f"[{req_id}] Saved debug audio: {debug_path}")
+            except Exception as save_err:
+                logger.warning(f"[{req_id}] Failed to save debug audio: {save_err}")
 
         # Actual STT call
         logger.info(f"[{req_id}] Starting transcription...")
-        text = stt.transcribe_for_api(audio_bytes)
+        result = await transcribe_upload(audio_bytes)
+        text = result["text"]
         duration = time.time() - start
 
         logger.info(f"[{req_id}] STT Success in {duration:.2f}s -> '{text}'")
@@ -132,6 +162,9 @@ async def stt_from_json(req: STTJsonRequest):
                 "request_id": req_id,
                 "duration_sec": round(duration, 2),
                 "bytes_received": len(audio_bytes),
+                "queue_wait_sec": result["queue_wait_sec"],
+                "inference_sec": result["inference_sec"],
+                "batch_size": result["batch_size"],
             }
         }
 
@@ -140,4 +173,98 @@ async def stt_from_json(req: STTJsonRequest):
 
     except Exception as e:
         logger.exception(f"[{req_id}] STT crashed unexpectedly")
-        raise HTTPException(status_code=500, detail=f"STT failed [{req_id}]: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"STT failed [{req_id}]: {e}")
+
+
+# =========================
+# STREAMING (WebSocket)
+# =========================
+async def _send_partial(ws: WebSocket, stream: StreamingTranscriber):
+    utterance_id, audio = stream.snapshot()
+    text = await asyncio.to_thread(stream.transcribe_partial, audio)
+
+    # Utterance already finalized while we were decoding → drop it
+    if text and utterance_id == stream.utterance_id:
+        await ws.send_json({"type": "partial", "text": text})
+
+
+async def _send_final(ws: WebSocket, stream: StreamingTranscriber, audio, req_id):
+    start = time.time()
+    text = await asyncio.to_thread(stream.transcribe_final, audio)
+
+    await ws.send_json({
+        "type": "final",
+        "text": text,
+        "debug": {
+            "request_id": req_id,
+            "audio_sec": round(len(audio) / 16000, 2),
+            "inference_sec": round(time.time() - start, 2),
+        }
+    })
+
+
+@router.websocket("/ws")
+async def stt_stream(ws: WebSocket, format: str = "pcm", sample_rate: int = 16000):
+    """
+    Streaming STT for the browser.
+
+    Send binary frames of raw int16 mono PCM (`?format=pcm&sample_rate=...`)
+    or raw Opus packets (`?format=opus`). The server replies with
+    {"type": "partial"} messages while you speak and one {"type": "final"}
+    per utterance. Send the text message {"type": "end"} to flush.
+    """
+    await ws.accept()
+    req_id = str(uuid.uuid4())[:8]
+
+    try:
+        stream = StreamingTranscriber(fmt=format, sample_rate=sample_rate)
+    except Exception as e:
+        logger.exception(f"[{req_id}] Failed to start STT stream")
+        await ws.send_json({"type": "error", "error": str(e)})
+        await ws.close()
+        return
+
+    logger.info(f"[{req_id}] STT stream opened ({format}, {sample_rate} Hz)")
+    partial_task = None
+
+    try:
+        while True:
+            msg = await ws.receive()
+
+            if msg["type"] == "websocket.disconnect":
+                break
+
+            if msg.get("bytes"):
+                for audio in stream.feed(msg["bytes"]):
+                    await _send_final(ws, stream, audio, req_id)
+
+                # Only one partial decode in flight per connection
+                if stream.partial_due() and (partial_task is None or partial_task.done()):
+                    partial_task = asyncio.create_task(_send_partial(ws, stream))
+
+            elif msg.get("text"):
+                try:
+                    control = json.loads(msg["text"])
+                except Exception:
+                    continue
+
+                if control.get("type") == "end":
+                    audio = stream.flush()
+                    if audio is not None:
+                        await _send_final(ws, stream, audio, req_id)
+                    await ws.send_json({"type": "done"})
+
+    except WebSocketDisconnect:
+        pass
+
+    except Exception as e:
+        logger.exception(f"[{req_id}] STT stream crashed")
+        try:
+            await ws.send_json({"type": "error", "error": str(e)})
+        except Exception:
+            pass
+
+    finally:
+        if partial_task is not None:
+            partial_task.cancel()
+        logger.info(f"[{req_id}] STT stream closed")
@@ -1,6 +1,6 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Query
 from fastapi.responses import JSONResponse
-from debug.tool_calls import get_tool_log
+from debug.tool_calls import query_tool_log, get_tool_stats, TOOL_CALL_LOG
 import datetime
 
 router = APIRouter(prefix="/api", tags=["tools"])
@@ -33,14 +33,22 @@ async def get_tools():
     return JSONResponse({"tools": tools})
 
 @router.get("/tools/usage")
-def get_tool_usage():
-    raw = get_tool_log()
+def get_tool_usage(
+    tool: str | None = None,
+    success: bool | None = None,
+    tag: str | None = None,
+    since: str | None = Query(None, description="ISO timestamp, e.g. 2025-01-01T00:00:00Z"),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500),
+):
+    raw, total = query_tool_log(tool=tool, success=success, tag=tag, since=since, offset=offset, limit=limit)
     usage = []
 
     for entry in raw:
         metadata = entry.get("metadata", {})
 
         usage.append({
+            "id": entry.get("id"),
             "tool": entry.get("tool", "unknown_tool"),
             "metadata": {
                 "success": bool(metadata.get("success", True)),
@@ -52,4 +60,18 @@ def get_tool_usage():
             )
         })
 
-    return { "usage": usage }
\ No newline at end of file
+    return {
+        "usage": usage,
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+    }
+
+@router.get("/tools/stats")
+def get_tool_usage_stats():
+    """Per-tool calls, failures and latency (p50/p95 over recent calls)."""
+    return {
+        "tools": get_tool_stats(),
+        "log_size": len(TOOL_CALL_LOG),
+        "log_capacity": TOOL_CALL_LOG.maxlen,
+    }
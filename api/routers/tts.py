@@ -1,18 +1,16 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 import tts.voice as voice
+from tts.audio_cache import get_phrase_cache
+from tts.audio_stream import stream_speech, MEDIA_TYPES
 import yaml
-from fastapi.responses import StreamingResponse, FileResponse
-import io
-import wave
-import soundfile as sf
-import tempfile
-import os
+from fastapi.responses import StreamingResponse
 
 router = APIRouter(prefix="/api/tts", tags=["TTS"])
 
 class TTSRequest(BaseModel):
     text: str
+    format: str = "wav"   # "wav" (streamed PCM) or "ogg" (Ogg/Opus), /generate only
 
 
 with open("config.yaml", "r") as f:
@@ -50,7 +48,9 @@ async def tts_health():
 
     print("DEBUG TTS HEALTH — voiceEngine =", voice.voiceEngine)
 
-    return get_tts_status()
+    status = get_tts_status()
+    status["cache"] = get_phrase_cache().stats()
+    return status
 
 
 @router.post("/speak")
@@ -106,33 +106,27 @@ async def tts_speak(req: TTSRequest):
 
 @router.post("/generate")
 async def tts_generate(req: TTSRequest):
+    """
+    Stream speech for `text` as it is synthesized.
+
+    Sentences are synthesized off the event loop and sent as soon as each
+    is ready: a streaming WAV (header + raw PCM) by default, or Ogg/Opus
+    with "format": "ogg". Playback can start after the first sentence.
+    """
     if not voice.voiceEngine:
         raise HTTPException(status_code=503, detail="TTS engine not initialized")
 
+    fmt = (req.format or "wav").lower()
+    if fmt not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{req.format}'")
+
     try:
         text = voice.voiceEngine.clean_for_tts(req.text)
-
-        # temp wav file
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
-            wav_path = tmp.name
-
-        # --- EDGE TTS SUPPORT ---
-        if hasattr(voice.voiceEngine, "VOICE"):
-            # Edge-TTS
-            import edge_tts
-            communicate = edge_tts.Communicate(text, voice.voiceEngine.VOICE)
-            await communicate.save(wav_path)
-        else:
-            # Piper fallback
-            with wave.open(wav_path, "wb") as wav_file:
-                voice.voiceEngine.voice.synthesize_wav(text, wav_file)
-
-        # return wav bytes
-        with open(wav_path, "rb") as f:
-            audio_bytes = f.read()
-
-        os.remove(wav_path)
-        return StreamingResponse(io.BytesIO(audio_bytes), media_type="audio/wav")
-
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"TTS generate failed: {e}")
+
+    return StreamingResponse(
+        stream_speech(voice.voiceEngine, text, fmt),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Cache-Control": "no-cache"},
+    )
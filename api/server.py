@@ -75,6 +75,33 @@ def init_tts():
     except Exception as e:
         print("❌ Failed to init TTS:", e)
 
+@app.on_event("startup")
+def init_llm():
+    """Build the shared agent once, before the first chat request needs it."""
+    try:
+        from core.llm import get_llm
+        get_llm()
+        print("🧠 Shared LLM runtime ready")
+    except Exception as e:
+        print("❌ Failed to init LLM:", e)
+
+@app.on_event("startup")
+def warm_up_stt():
+    """
+    Load the Whisper models used by /api/stt uploads in the background,
+    so the first request doesn't pay the model load.
+    """
+    import threading
+    from stt.whisper_pool import get_whisper_pool
+
+    def _warm():
+        try:
+            get_whisper_pool().warm_up()
+        except Exception as e:
+            print("❌ Failed to warm up Whisper:", e)
+
+    threading.Thread(target=_warm, daemon=True).start()
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],   
@@ -0,0 +1,447 @@
+# core/checkpointer.py
+
+import asyncio
+import atexit
+import random
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import yaml
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+
+try:
+    with open("config.yaml", "r") as f:
+        config = yaml.safe_load(f) or {}
+except Exception as e:
+    print(f"[ERROR] Failed to load configuration: {e}")
+    config = {}
+
+llm_cfg = config.get("LLM", {}) or {}
+
+CHECKPOINTER = str(llm_cfg.get("CHECKPOINTER", "memory")).lower()
+CHECKPOINT_DB = llm_cfg.get("CHECKPOINT_DB", "atom_checkpoints.db")
+CHECKPOINT_HOT_THREADS = int(llm_cfg.get("CHECKPOINT_HOT_THREADS", 64))
+CHECKPOINT_FLUSH_MS = int(llm_cfg.get("CHECKPOINT_FLUSH_MS", 500))
+CHECKPOINT_BATCH_SIZE = int(llm_cfg.get("CHECKPOINT_BATCH_SIZE", 64))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+"""
+
+# column order of one checkpoints row
+CHECKPOINT_COLUMNS = (
+    "thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+    "type, checkpoint, metadata_type, metadata"
+)
+
+
+class _HotThread:
+    """Latest checkpoint row (and its writes) per namespace of one thread."""
+
+    def __init__(self):
+        self.latest = {}   # checkpoint_ns -> checkpoints row
+        self.writes = {}   # checkpoint_ns -> {(task_id, idx): writes row}
+
+
+class BatchedSqliteSaver(BaseCheckpointSaver):
+    """
+    LangGraph checkpointer backed by SQLite.
+
+    - put()/put_writes() only queue rows; a flusher thread commits them in
+      one transaction every CHECKPOINT_FLUSH_MS (or once CHECKPOINT_BATCH_SIZE
+      rows are queued), instead of one fsync per agent step.
+    - The latest checkpoint of the most recently used threads is kept in
+      an LRU "hot" cache, so resuming an active conversation never reads
+      SQLite. Cold reads flush the queue first, so they always see
+      everything that was written.
+    """
+
+    def __init__(self, path=CHECKPOINT_DB, hot_threads=CHECKPOINT_HOT_THREADS,
+                 flush_ms=CHECKPOINT_FLUSH_MS, batch_size=CHECKPOINT_BATCH_SIZE, *, serde=None):
+        super().__init__(serde=serde)
+
+        self.path = str(path)
+        self.hot_threads = max(1, hot_threads)
+        self.flush_interval = max(flush_ms, 1) / 1000
+        self.batch_size = max(1, batch_size)
+
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.db_lock = threading.Lock()
+
+        self.hot = OrderedDict()      # thread_id -> _HotThread
+        self.lock = threading.Lock()
+
+        # queued rows: ("checkpoint", row) or ("writes", replace, rows)
+        self.pending = []
+        self.pending_cond = threading.Condition(self.lock)
+        self.closed = False
+
+        self.flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self.flusher.start()
+        atexit.register(self.close)
+
+    # -----------------------------------------------------------
+    # Write path
+    # -----------------------------------------------------------
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        configurable = config["configurable"]
+        thread_id = str(configurable["thread_id"])
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+
+        type_, data = self.serde.dumps_typed(checkpoint)
+        meta_type, meta = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+
+        row = (
+            thread_id, checkpoint_ns, checkpoint["id"], configurable.get("checkpoint_id"),
+            type_, data, meta_type, meta,
+        )
+
+        with self.lock:
+            hot = self._touch(thread_id)
+            hot.latest[checkpoint_ns] = row
+            hot.writes[checkpoint_ns] = {}
+            self._enqueue(("checkpoint", row))
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        configurable = config["configurable"]
+        thread_id = str(configurable["thread_id"])
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        checkpoint_id = configurable["checkpoint_id"]
+
+        # special channels (errors, interrupts, ...) overwrite, others keep the first write
+        replace = all(channel in WRITES_IDX_MAP for channel, _ in writes)
+
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            type_, data = self.serde.dumps_typed(value)
+            rows.append((
+                thread_id, checkpoint_ns, checkpoint_id, task_id,
+                WRITES_IDX_MAP.get(channel, idx), channel, type_, data, task_path,
+            ))
+
+        with self.lock:
+            hot = self.hot.get(thread_id)
+            latest = hot.latest.get(checkpoint_ns) if hot else None
+            if latest is not None and latest[2] == checkpoint_id:
+                cached = hot.writes.setdefault(checkpoint_ns, {})
+                for row in rows:
+                    key = (row[3], row[4])
+                    if replace or key not in cached:
+                        cached[key] = row
+            self._enqueue(("writes", replace, rows))
+
+    def delete_thread(self, thread_id):
+        with self.lock:
+            self.hot.pop(str(thread_id), None)
+        self.flush()
+
+        with self.db_lock, self.conn:
+            self.conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (str(thread_id),))
+            self.conn.execute("DELETE FROM writes WHERE thread_id = ?", (str(thread_id),))
+
+    def _enqueue(self, item):
+        """Queue one item for the flusher. Caller holds self.lock."""
+        self.pending.append(item)
+        if len(self.pending) >= self.batch_size:
+            self.pending_cond.notify()
+
+    def _flush_loop(self):
+        while True:
+            with self.lock:
+                if not self.closed and len(self.pending) < self.batch_size:
+                    self.pending_cond.wait(self.flush_interval)
+                closed = self.closed
+
+            self.flush()
+
+            if closed:
+                return
+
+    def flush(self):
+        """Commit everything queued so far in one transaction."""
+        with self.db_lock:
+            with self.lock:
+                batch, self.pending = self.pending, []
+
+            if not batch:
+                return
+
+            try:
+                with self.conn:
+                    for item in batch:
+                        if item[0] == "checkpoint":
+                            self.conn.execute(
+                                f"INSERT OR REPLACE INTO checkpoints ({CHECKPOINT_COLUMNS}) "
+                                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                item[1],
+                            )
+                        else:
+                            verb = "INSERT OR REPLACE" if item[1] else "INSERT OR IGNORE"
+                            self.conn.executemany(
+                                f"{verb} INTO writes (thread_id, checkpoint_ns, checkpoint_id, "
+                                "task_id, idx, channel, type, value, task_path) "
+                                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                item[2],
+                            )
+            except Exception as e:
+                print(f"[ERROR] Failed to write checkpoints: {e}")
+
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.pending_cond.notify()
+
+        self.flusher.join(timeout=5)
+        self.flush()
+
+    # -----------------------------------------------------------
+    # Read path
+    # -----------------------------------------------------------
+
+    def _touch(self, thread_id):
+        """Hot entry for a thread, marked most recently used. Caller holds self.lock."""
+        hot = self.hot.get(thread_id)
+        if hot is None:
+            hot = self.hot[thread_id] = _HotThread()
+            while len(self.hot) > self.hot_threads:
+                self.hot.popitem(last=False)   # already queued/persisted, safe to drop
+        else:
+            self.hot.move_to_end(thread_id)
+        return hot
+
+    def _to_tuple(self, row, writes):
+        thread_id, checkpoint_ns, checkpoint_id, parent_id, type_, data, meta_type, meta = row
+
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint=self.serde.loads_typed((type_, data)),
+            metadata=self.serde.loads_typed((meta_type, meta)),
+            parent_config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": parent_id,
+                }
+            } if parent_id else None,
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((w_type, value)))
+                for _, _, _, task_id, _, channel, w_type, value, _ in writes
+            ],
+        )
+
+    def _load_writes(self, thread_id, checkpoint_ns, checkpoint_id):
+        """Caller holds self.db_lock."""
+        return self.conn.execute(
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, value, task_path "
+            "FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? "
+            "ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+
+    def _get_hot(self, config):
+        """Checkpoint tuple from the hot cache, or None if it has to come from SQLite."""
+        configurable = config["configurable"]
+        thread_id = str(configurable["thread_id"])
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+
+        with self.lock:
+            hot = self.hot.get(thread_id)
+            row = hot.latest.get(checkpoint_ns) if hot else None
+            if row is None or (checkpoint_id is not None and row[2] != checkpoint_id):
+                return None
+            self.hot.move_to_end(thread_id)
+            writes = sorted(hot.writes.get(checkpoint_ns, {}).values(), key=lambda w: (w[3], w[4]))
+
+        return self._to_tuple(row, writes)
+
+    def get_tuple(self, config):
+        item = self._get_hot(config)
+        if item is not None:
+            return item
+        return self._get_cold(config)
+
+    def _get_cold(self, config):
+        configurable = config["configurable"]
+        thread_id = str(configurable["thread_id"])
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+
+        # make sure SQLite has everything, then read it
+        self.flush()
+
+        with self.db_lock:
+            if checkpoint_id:
+                row = self.conn.execute(
+                    f"SELECT {CHECKPOINT_COLUMNS} FROM checkpoints "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = self.conn.execute(
+                    f"SELECT {CHECKPOINT_COLUMNS} FROM checkpoints "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns),
+                ).fetchone()
+
+            if row is None:
+                return None
+
+            writes = self._load_writes(thread_id, checkpoint_ns, row[2])
+
+        if not checkpoint_id:
+            # resumed thread becomes hot again
+            with self.lock:
+                hot = self._touch(thread_id)
+                if checkpoint_ns not in hot.latest:
+                    hot.latest[checkpoint_ns] = row
+                    hot.writes[checkpoint_ns] = {(w[3], w[4]): w for w in writes}
+
+        return self._to_tuple(row, writes)
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        self.flush()
+
+        query = f"SELECT {CHECKPOINT_COLUMNS} FROM checkpoints"
+        where, params = [], []
+
+        if config is not None:
+            configurable = config["configurable"]
+            where.append("thread_id = ?")
+            params.append(str(configurable["thread_id"]))
+            if configurable.get("checkpoint_ns") is not None:
+                where.append("checkpoint_ns = ?")
+                params.append(configurable["checkpoint_ns"])
+            if get_checkpoint_id(config):
+                where.append("checkpoint_id = ?")
+                params.append(get_checkpoint_id(config))
+
+        if before is not None and get_checkpoint_id(before):
+            where.append("checkpoint_id < ?")
+            params.append(get_checkpoint_id(before))
+
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY checkpoint_id DESC"
+
+        with self.db_lock:
+            rows = self.conn.execute(query, params).fetchall()
+
+        count = 0
+        for row in rows:
+            if limit is not None and count >= limit:
+                break
+
+            with self.db_lock:
+                writes = self._load_writes(row[0], row[1], row[2])
+            item = self._to_tuple(row, writes)
+
+            if filter and not all(item.metadata.get(k) == v for k, v in filter.items()):
+                continue
+
+            count += 1
+            yield item
+
+    # -----------------------------------------------------------
+    # Async API: hot reads and put()/put_writes() (which only queue) stay
+    # on the event loop; anything that flushes or queries SQLite runs in a
+    # worker thread.
+    # -----------------------------------------------------------
+
+    async def aget_tuple(self, config):
+        item = self._get_hot(config)
+        if item is not None:
+            return item
+        return await asyncio.to_thread(self._get_cold, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id):
+        return await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def get_next_version(self, current, channel):
+        # same version format as InMemorySaver
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+
+def create_checkpointer():
+    """Checkpointer selected by LLM.CHECKPOINTER in config.yaml ("memory" or "sqlite")."""
+    if CHECKPOINTER == "sqlite":
+        try:
+            return BatchedSqliteSaver()
+        except Exception as e:
+            print(f"[ERROR] Failed to open checkpoint database, using memory: {e}")
+    elif CHECKPOINTER != "memory":
+        print(f"[WARN] Unknown LLM.CHECKPOINTER '{CHECKPOINTER}', using memory.")
+
+    return InMemorySaver()
@@ -0,0 +1,150 @@
+# core/context_trim.py
+
+import json
+import threading
+from collections import OrderedDict
+
+import yaml
+from langchain.agents.middleware import AgentMiddleware, AgentState
+from langchain.messages import AIMessage, RemoveMessage, SystemMessage, ToolMessage
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+
+try:
+    with open("config.yaml", "r") as f:
+        config = yaml.safe_load(f) or {}
+except Exception as e:
+    print(f"[ERROR] Failed to load configuration: {e}")
+    config = {}
+
+llm_cfg = config.get("LLM", {}) or {}
+
+# Tokens of conversation history sent per model call. The model is loaded
+# with a 12,000 token context (core/lms.py); the rest is left for the
+# system prompt, tool schemas and the reply (max_tokens=1024).
+HISTORY_TOKEN_BUDGET = int(llm_cfg.get("HISTORY_TOKEN_BUDGET", 7000))
+
+# Rough per-message overhead of the chat template (role, separators)
+MESSAGE_OVERHEAD = 4
+
+
+def message_text(message) -> str:
+    """Everything in a message that ends up in the prompt."""
+    content = getattr(message, "content", "")
+
+    if isinstance(content, list):
+        content = "\n".join(
+            block.get("text", "") if isinstance(block, dict) else str(block)
+            for block in content
+        )
+
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        content = f"{content}\n{json.dumps([{'name': c.get('name'), 'args': c.get('args')} for c in tool_calls], default=str)}"
+
+    return str(content)
+
+
+class TokenBudgetTrimMiddleware(AgentMiddleware):
+    """
+    Keep as much recent history as fits in `budget` tokens.
+
+    - Token counts are cached per message id, so each message is counted
+      once rather than the whole history every turn.
+    - An AI message with tool calls and its tool results are kept or
+      dropped together, so the model never sees a dangling call/result.
+    - The first message and injected system messages (memory context)
+      are always kept.
+    - Once over budget, history is cut down to `target` tokens (default:
+      the budget itself). A lower target leaves the head of the prompt
+      unchanged for several turns, which keeps the server's prefix cache
+      valid instead of sliding the window every turn.
+    """
+
+    def __init__(self, tokenizer, budget=HISTORY_TOKEN_BUDGET, target=None, cache_size=4096):
+        super().__init__()
+        self.tokenizer = tokenizer
+        self.budget = budget
+        self.target = min(target or budget, budget)
+        self.cache_size = cache_size
+
+        self.counts = OrderedDict()   # message id -> tokens
+        self.lock = threading.Lock()
+
+    def _tokens(self, text: str) -> int:
+        try:
+            return self.tokenizer(text)
+        except Exception:
+            return len(text) // 4   # tokenizer unavailable: ~4 chars per token
+
+    def count(self, message) -> int:
+        msg_id = getattr(message, "id", None)
+
+        if msg_id is not None:
+            with self.lock:
+                tokens = self.counts.get(msg_id)
+                if tokens is not None:
+                    self.counts.move_to_end(msg_id)
+                    return tokens
+
+        tokens = self._tokens(message_text(message)) + MESSAGE_OVERHEAD
+
+        if msg_id is not None:
+            with self.lock:
+                self.counts[msg_id] = tokens
+                while len(self.counts) > self.cache_size:
+                    self.counts.popitem(last=False)
+
+        return tokens
+
+    @staticmethod
+    def _units(messages):
+        """Group messages so a tool-calling AI message and its results stay together."""
+        units = []
+        open_calls = set()
+
+        for m in messages:
+            if isinstance(m, ToolMessage) and units and m.tool_call_id in open_calls:
+                units[-1].append(m)
+                open_calls.discard(m.tool_call_id)
+                continue
+
+            units.append([m])
+            open_calls = {c["id"] for c in m.tool_calls} if isinstance(m, AIMessage) and m.tool_calls else set()
+
+        return units
+
+    def before_model(self, state: AgentState, runtime):
+        messages = state["messages"]
+        if len(messages) <= 1:
+            return None
+
+        # always kept: the first message and injected system context
+        pinned = [m for i, m in enumerate(messages) if i == 0 or isinstance(m, SystemMessage)]
+        pinned_ids = {id(m) for m in pinned}
+        history = [m for m in messages if id(m) not in pinned_ids]
+
+        used = sum(self.count(m) for m in pinned)
+        if used + sum(self.count(m) for m in history) <= self.budget:
+            return None
+
+        kept = []
+
+        # newest first, stop at the first unit that doesn't fit
+        for unit in reversed(self._units(history)):
+            tokens = sum(self.count(m) for m in unit)
+            if kept and used + tokens > self.target:
+                break
+            kept[:0] = unit
+            used += tokens
+
+        if len(kept) == len(history):
+            return None
+
+        kept_ids = {id(m) for m in kept} | pinned_ids
+
+        return {
+            "messages": [
+                RemoveMessage(id=REMOVE_ALL_MESSAGES),
+                *[m for m in messages if id(m) in kept_ids]
+            ]
+        }
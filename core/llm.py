@@ -1,58 +1,56 @@
 #llm.py
 
-from langchain.agents import create_agent, AgentState
+from langchain.agents import create_agent
 from langchain_openai import ChatOpenAI
-from langgraph.checkpoint.memory import InMemorySaver
-from langchain.messages import ToolMessage, RemoveMessage
-from langchain.agents.middleware import ToolRetryMiddleware, FilesystemFileSearchMiddleware, wrap_tool_call, before_model, SummarizationMiddleware
-from langgraph.graph.message import REMOVE_ALL_MESSAGES
+from langchain.messages import ToolMessage
+from langchain.agents.middleware import AgentMiddleware, ToolRetryMiddleware, FilesystemFileSearchMiddleware, SummarizationMiddleware
 from tools.tools import tools
 from tools.system_tools import system_tools
-from langgraph.runtime import Runtime
-from typing import Any
+import threading
 from memory.long_term_memory import LongTermMemory
 from memory.memory_write_middleware import AsyncMemoryWriteMiddleware
 from debug.token_debug_middleware import TokenDebugMiddleware
 from debug.json_logging_middleware import JSONLoggingMiddleware
-from embedding.embedding_client import FastAPIEmbeddings
-from memory.chroma_store import get_chroma_store
+from debug.tracing import get_tracer
+from debug.tool_calls import ToolUsageMiddleware
+from memory.chroma_store import get_chroma_store, get_embeddings
 from memory.memory_injection import PeriodicJudgeMiddleware, JudgedMemoryInjectionMiddleware
 from tts.middleware import TTSMiddleware
 from tts.middleware_frontend import TTSMiddlewareFrontend
+from core.checkpointer import create_checkpointer
+from core.context_trim import TokenBudgetTrimMiddleware, HISTORY_TOKEN_BUDGET
+from core.prompt_layout import PromptLayoutMiddleware, CACHE_FRIENDLY_PROMPT
 
 # Load the prompt from a text file
 with open("prompt.txt", "r", encoding="utf-8") as f:
     atom_prompt = f.read()
 
-@wrap_tool_call
-def handle_tool_errors(request, handler):
-    """Handle tool execution errors with custom messages."""
-    try:
-        return handler(request)
-    except Exception as e:
+class ToolErrorMiddleware(AgentMiddleware):
+    """
+    Handle tool execution errors with custom messages.
+    Implements both hooks so the agent works with stream() and astream().
+    """
+
+    def _error_message(self, request, e):
         return ToolMessage(
             content=f"Tool error: Please check your input and try again. ({str(e)})",
-            tool_call_id=request.tool_call["id"]
+            tool_call_id=request.tool_call["id"],
+            status="error",
         )
 
-@before_model
-def trim_messages(state: AgentState, runtime: Runtime) -> dict[str, Any] | None:
-    """Keep only the last few messages to fit context window."""
-    messages = state["messages"]
-
-    if len(messages) <= 3:
-        return None
+    def wrap_tool_call(self, request, handler):
+        try:
+            return handler(request)
+        except Exception as e:
+            return self._error_message(request, e)
 
-    first_msg = messages[0]
-    recent_messages = messages[-3:] if len(messages) % 2 == 0 else messages[-4:]
-    new_messages = [first_msg] + recent_messages
+    async def awrap_tool_call(self, request, handler):
+        try:
+            return await handler(request)
+        except Exception as e:
+            return self._error_message(request, e)
 
-    return {
-        "messages": [
-            RemoveMessage(id=REMOVE_ALL_MESSAGES),
-            *new_messages
-        ]
-    }
+handle_tool_errors = ToolErrorMiddleware()
 
 class LLM():
     def __init__(self, tools=tools + system_tools,
@@ -98,9 +96,13 @@ class LLM():
             self.api_key = "no-key-required"
             self.embedding_url = "http://localhost:2000/v1"
 
+        self.user_id = str(config.get("USER_ID", "1"))
+
         # -----------------------------
         # Safe Model Initialization
         # -----------------------------
+        tracer = get_tracer()
+
         try:
             self.model = ChatOpenAI(
                 base_url=self.base_url,
@@ -111,7 +113,9 @@ class LLM():
                 temperature=0,
                 max_tokens=1024,
                 max_retries=3,
-                timeout=600
+                timeout=600,
+                # time to first token / tokens per second for /api/health/latency
+                callbacks=[tracer.callback_handler] if tracer.enabled else None,
             )
 
             self.summary_model = ChatOpenAI(
@@ -130,13 +134,21 @@ class LLM():
             self.model = None
 
         # client = chromadb.PersistentClient(path="./atom_db")
-        self.embeddings = FastAPIEmbeddings(base_url=self.embedding_url)
+        self.embeddings = get_embeddings()
         self.store = get_chroma_store()
 
         self.long_term_memory = LongTermMemory(store=self.store)
         # memory_retriever = MemoryRetrievalMiddleware(self.long_term_memory)
         memory_writer = AsyncMemoryWriteMiddleware(self.long_term_memory, self.summary_model)
-        debugger = TokenDebugMiddleware(tokenizer=self.model.get_num_tokens)
+        # counts are memoized per message, cheap enough to keep on
+        debugger = TokenDebugMiddleware(tokenizer=self.model.get_num_tokens, verbose=False)
+        history_trimmer = TokenBudgetTrimMiddleware(
+            tokenizer=self.model.get_num_tokens,
+            # trim in larger steps so the prompt head stays cacheable
+            target=int(HISTORY_TOKEN_BUDGET * 0.6) if CACHE_FRIENDLY_PROMPT else None,
+        )
+        # Kept on self so generate_chunks can stream deltas into it
+        self.tts_middleware = TTSMiddleware()
 
         # -----------------------------
         # Validate tools list
@@ -156,20 +168,26 @@ class LLM():
                 self.model,
                 tools=self.tools,
                 system_prompt=self.system_prompt,
-                middleware=[
-                    # debugger,
+                # every middleware hook is wrapped in a latency span
+                middleware=tracer.instrument([
+                    debugger,
                     JSONLoggingMiddleware(output_file='atom_logs.json'),
-                    TTSMiddleware(),           # <---Comment this for Web UI
+                    self.tts_middleware,       # <---Comment this for Web UI
                     # TTSMiddlewareFrontend(),          <---Uncomment this for Web UI
                     PeriodicJudgeMiddleware(self.summary_model, self.store, config['USER_ID'], 10),
                     JudgedMemoryInjectionMiddleware(config['USER_ID']),
-                    trim_messages,
+                    PromptLayoutMiddleware(),
+                    history_trimmer,
                     SummarizationMiddleware(
                         model=self.summary_model,
                         trigger=("tokens", 8000),
                         keep=("messages", 20),
                     ),
                     memory_writer,
+                    # outside the retry middleware, so it only sees a failure once
+                    # the retries are used up
+                    handle_tool_errors,
+                    ToolUsageMiddleware(),     # per-tool stats for /api/tools/stats
                     ToolRetryMiddleware(
                         max_retries=3,
                         backoff_factor=2.0,
@@ -179,9 +197,8 @@ class LLM():
                         root_path=Path(__file__).resolve(),
                         use_ripgrep=True,
                     ),
-                    handle_tool_errors,
-                ],
-                checkpointer=InMemorySaver(),
+                ]),
+                checkpointer=create_checkpointer(),
                 # debug=True,
                 store=self.store
             )
@@ -211,10 +228,19 @@ class LLM():
 
         return f"## Memories of user\n{memories}"
 
-    def give_output(self, role_input, role):        
+    def thread_id(self, session_id=None) -> str:
+        """
+        LangGraph thread for a client session. Without a session id every
+        caller shares the USER_ID thread, as before.
+        """
+        if not session_id:
+            return self.user_id
+        return f"{self.user_id}:{str(session_id)[:128]}"
+
+    def give_output(self, role_input, role, thread_id=None):
         response = self.agent.invoke(
             {"messages": [{"role": str(role), "content": str(role_input)}]},
-            {"configurable": {"thread_id": "1"}},
+            {"configurable": {"thread_id": thread_id or self.user_id}},
         )
 
         ai_message = response['messages'][-1].content
@@ -270,8 +296,68 @@ class LLM():
             if metadata.get("langgraph_node") != "model":
                 continue
 
+            thread_id = metadata.get("thread_id", user_id)
+            if getattr(token, "tool_call_chunks", None):
+                # tool-calling turn: keep it off the speakers
+                self.tts_middleware.on_delta(None, thread_id, tool_call=True)
+
+            for block in token.content_blocks:
+                if block.get("type") == "text":
+                    text = block.get("text")
+                    if text:
+                        # start speaking before the reply is complete
+                        self.tts_middleware.on_delta(text, thread_id)
+                        yield text
+
+    async def agenerate_chunks(self, user_input: str, user_id: str):
+        """
+        Async twin of generate_chunks for the API routers.
+        Model HTTP reads are awaited, so a long reply doesn't hold the
+        event loop while other requests wait.
+        """
+        async for token, metadata in self.agent.astream(
+            {
+                "messages": [
+                    {"role": "user", "content": str(user_input)}
+                ]
+            },
+            {"configurable": {"thread_id": user_id}},
+            stream_mode="messages",
+        ):
+            # only handle model chunks
+            if metadata.get("langgraph_node") != "model":
+                continue
+
+            thread_id = metadata.get("thread_id", user_id)
+            if getattr(token, "tool_call_chunks", None):
+                # tool-calling turn: keep it off the speakers
+                self.tts_middleware.on_delta(None, thread_id, tool_call=True)
+
             for block in token.content_blocks:
                 if block.get("type") == "text":
                     text = block.get("text")
                     if text:
+                        # start speaking before the reply is complete
+                        self.tts_middleware.on_delta(text, thread_id)
                         yield text
+
+
+# -----------------------------------------------------------
+# Process-wide instance
+# -----------------------------------------------------------
+
+_llm = None
+_llm_lock = threading.Lock()
+
+def get_llm():
+    """
+    The shared LLM runtime (agent, summary model, store, checkpointer).
+    Built on first use; every entry point should go through this instead
+    of constructing its own LLM().
+    """
+    global _llm
+    if _llm is None:
+        with _llm_lock:
+            if _llm is None:
+                _llm = LLM()
+    return _llm
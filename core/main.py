@@ -21,8 +21,8 @@ USE_STT = bool(config['USE_STT'])
 USE_TTS = bool(config['USE_TTS'])
 USE_EDGE_TTS = bool(config['USE_EDGE_TTS'])
 
-from core.llm import LLM
-brain = LLM()
+from core.llm import get_llm
+brain = get_llm()
 
 def init_lms(progress_bar):
     global LMS
@@ -0,0 +1,175 @@
+# core/prompt_layout.py
+
+import json
+import os
+import threading
+from collections import OrderedDict, deque
+
+import yaml
+from langchain.agents.middleware import AgentMiddleware
+from langchain.messages import SystemMessage
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+try:
+    with open("config.yaml", "r") as f:
+        config = yaml.safe_load(f) or {}
+except Exception as e:
+    print(f"[ERROR] Failed to load configuration: {e}")
+    config = {}
+
+llm_cfg = config.get("LLM", {}) or {}
+
+# Keep the prompt head (system prompt, tool schemas, older history)
+# byte-identical across turns and put dynamic memory at the tail, so the
+# local server can reuse its prefix / KV cache.
+CACHE_FRIENDLY_PROMPT = bool(llm_cfg.get("CACHE_FRIENDLY_PROMPT", False))
+# Print how much of each prompt matches the previous one for the thread
+PROMPT_PREFIX_DEBUG = bool(llm_cfg.get("PROMPT_PREFIX_DEBUG", False))
+
+MEMORY_MESSAGE_NAME = "memory_context"
+# Threads whose last prompt is kept for the prefix report
+PREFIX_THREADS = 256
+
+# Dynamic context appended at the tail of the next model call on a thread.
+# thread_id -> {key (e.g. "memory", "judged:<session>") -> text}
+TAIL_CONTEXT = {}
+_tail_lock = threading.Lock()
+
+# Recent stable-prefix reports, newest last
+PREFIX_REPORTS = deque(maxlen=200)
+
+
+def _thread_id() -> str:
+    try:
+        from langgraph.config import get_config
+        return str(get_config()["configurable"].get("thread_id", ""))
+    except Exception:
+        return ""
+
+
+def set_tail_context(key: str, text: str, thread_id=None):
+    """
+    Replace one piece of tail context for a thread (the running one by
+    default), used instead of editing the message history.
+    """
+    thread_id = _thread_id() if thread_id is None else thread_id
+    with _tail_lock:
+        context = TAIL_CONTEXT.setdefault(thread_id, {})
+        if text:
+            context[key] = text
+        else:
+            context.pop(key, None)
+        if not context:
+            TAIL_CONTEXT.pop(thread_id, None)
+
+
+def take_tail_context(thread_id=None):
+    """Tail context for a thread, removed so it is sent only once."""
+    thread_id = _thread_id() if thread_id is None else thread_id
+    with _tail_lock:
+        return list(TAIL_CONTEXT.pop(thread_id, {}).values())
+
+
+def _message_text(message) -> str:
+    content = message.content if isinstance(message.content, str) else json.dumps(message.content, default=str)
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        content += json.dumps([[c.get("name"), c.get("args")] for c in tool_calls], default=str)
+    return f"{message.type}:{content}\n"
+
+
+def _common_prefix(a: str, b: str) -> int:
+    return len(os.path.commonprefix([a, b]))
+
+
+class PromptLayoutMiddleware(AgentMiddleware):
+    """
+    Lays out the final model request.
+
+    With CACHE_FRIENDLY_PROMPT, memory messages are taken out of the
+    history and sent, with the thread's pending tail context, after the
+    newest message. Tail context is consumed by the call that sends it.
+    Nothing here is written back to the agent state.
+
+    With PROMPT_PREFIX_DEBUG (or CACHE_FRIENDLY_PROMPT), each request is
+    compared to the previous one on the same thread and the length of the
+    unchanged prefix is recorded in PREFIX_REPORTS.
+    """
+
+    def __init__(self, cache_friendly=CACHE_FRIENDLY_PROMPT, diagnostics=PROMPT_PREFIX_DEBUG):
+        super().__init__()
+        self.cache_friendly = cache_friendly
+        self.diagnostics = diagnostics or cache_friendly
+
+        self.previous = OrderedDict()   # thread_id -> list of prompt segments (LRU)
+        self.tool_text = {}       # tool ids -> serialized schemas
+        self.lock = threading.Lock()
+
+    def _layout(self, request):
+        if not self.cache_friendly:
+            return request
+
+        history = [m for m in request.messages if getattr(m, "name", None) != MEMORY_MESSAGE_NAME]
+        tail = [SystemMessage(name=MEMORY_MESSAGE_NAME, content=text) for text in take_tail_context()]
+
+        if len(history) == len(request.messages) and not tail:
+            return request
+        return request.override(messages=history + tail)
+
+    def _tools_text(self, tools) -> str:
+        key = tuple(id(t) for t in tools)
+        text = self.tool_text.get(key)
+        if text is None:
+            schemas = []
+            for t in tools:
+                try:
+                    schemas.append(t if isinstance(t, dict) else convert_to_openai_tool(t))
+                except Exception:
+                    schemas.append(getattr(t, "name", str(t)))
+            text = self.tool_text[key] = json.dumps(schemas, sort_keys=True, default=str)
+        return text
+
+    def _report(self, request):
+        thread_id = _thread_id()
+
+        system = request.system_message.text if request.system_message else ""
+        segments = [system, self._tools_text(request.tools)] + [_message_text(m) for m in request.messages]
+        total = sum(len(s) for s in segments)
+
+        with self.lock:
+            previous = self.previous.pop(thread_id, None)
+            self.previous[thread_id] = segments
+            while len(self.previous) > PREFIX_THREADS:
+                self.previous.popitem(last=False)
+
+        stable = 0
+        if previous:
+            for old, new in zip(previous, segments):
+                if old == new:
+                    stable += len(new)
+                    continue
+                stable += _common_prefix(old, new)
+                break
+
+        report = {
+            "thread_id": thread_id,
+            "prompt_chars": total,
+            "stable_prefix_chars": stable,
+            "stable_ratio": round(stable / total, 3) if total else 0.0,
+            "messages": len(request.messages),
+        }
+        PREFIX_REPORTS.append(report)
+        print(f"🧩 Prompt prefix: {stable}/{total} chars stable ({report['stable_ratio']:.0%}), "
+              f"{len(request.messages)} messages")
+
+    def wrap_model_call(self, request, handler):
+        request = self._layout(request)
+        if self.diagnostics:
+            self._report(request)
+        return handler(request)
+
+    async def awrap_model_call(self, request, handler):
+        request = self._layout(request)
+        if self.diagnostics:
+            self._report(request)
+        return await handler(request)
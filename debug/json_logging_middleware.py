@@ -1,9 +1,17 @@
 # json_logging_middleware.py
 
+import atexit
+import gzip
 import json
-from datetime import datetime
+import os
+import queue
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
 from typing import Any
 
+import yaml
 from langchain.agents.middleware import (
     AgentMiddleware,
     AgentState,
@@ -11,13 +19,173 @@ from langchain.agents.middleware import (
     wrap_tool_call,
 )
 
+try:
+    with open("config.yaml", "r") as f:
+        config = yaml.safe_load(f) or {}
+except Exception as e:
+    print(f"[ERROR] Failed to load configuration: {e}")
+    config = {}
 
-def _serialize(x: Any):
-    try:
-        json.dumps(x)
-        return x
-    except Exception:
-        return repr(x)
+logging_cfg = config.get("LOGGING", {}) or {}
+
+LOG_MAX_MB = float(logging_cfg.get("MAX_MB", 20))          # rotate above this size
+LOG_ROTATE_HOURS = float(logging_cfg.get("ROTATE_HOURS", 24))  # ... or after this long (0 = never)
+LOG_BACKUPS = int(logging_cfg.get("BACKUPS", 5))           # rotated files kept
+LOG_GZIP = bool(logging_cfg.get("GZIP", True))             # compress rotated files
+LOG_FLUSH_MS = int(logging_cfg.get("FLUSH_MS", 200))       # max delay before a line hits disk
+LOG_QUEUE_SIZE = 10000
+
+
+def _default(x: Any):
+    """json.dumps fallback: anything it can't encode is logged as its repr."""
+    return repr(x)
+
+
+def _encode(payload: dict) -> str:
+    # single pass: unencodable values are repr()'d in place instead of
+    # test-dumping every payload first
+    return json.dumps(
+        payload,
+        ensure_ascii=False,    # keep real characters instead of \u2019
+        separators=(",", ":"), # compact JSON, stable formatting
+        default=_default,
+    )
+
+
+class JSONLogWriter:
+    """
+    Background writer for one JSON-lines file.
+
+    write() encodes the payload right away, so the line records the
+    objects as they were at that moment, and enqueues it. A daemon thread
+    appends queued lines in batches through one open file handle and
+    rotates the file by size or age (optionally gzipping old files).
+    """
+
+    def __init__(self, path, max_bytes=LOG_MAX_MB * 1024 * 1024, rotate_seconds=LOG_ROTATE_HOURS * 3600,
+                 backups=LOG_BACKUPS, compress=LOG_GZIP, flush_interval=LOG_FLUSH_MS / 1000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.backups = backups
+        self.compress = compress
+        self.flush_interval = flush_interval
+
+        self.queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        self.dropped = 0
+        self.file = None
+        self.opened_at = time.monotonic()
+
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def write(self, payload: dict):
+        try:
+            line = _encode(payload)   # snapshot now; the agent may mutate these objects later
+        except Exception as e:
+            print(f"[WARN] JSON log encode failed: {e}")
+            return
+        try:
+            self.queue.put_nowait(line)
+        except queue.Full:
+            self.dropped += 1   # never block the agent on logging
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join(timeout=2)
+
+    # ---- writer thread ----
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(self.path, "a", encoding="utf-8")
+        self.opened_at = time.monotonic()
+
+    def _should_rotate(self):
+        if self.max_bytes and self.file.tell() >= self.max_bytes:
+            return True
+        return bool(self.rotate_seconds) and time.monotonic() - self.opened_at >= self.rotate_seconds
+
+    def _rotate(self):
+        self.file.close()
+        self.file = None
+
+        if os.path.getsize(self.path):
+            stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+            rotated = f"{self.path}.{stamp}"
+            os.replace(self.path, rotated)
+
+            if self.compress:
+                with open(rotated, "rb") as src, gzip.open(rotated + ".gz", "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+                os.remove(rotated)
+
+            self._prune()
+
+        self._open()
+
+    def _prune(self):
+        directory = os.path.dirname(self.path) or "."
+        prefix = os.path.basename(self.path) + "."
+        old = sorted(name for name in os.listdir(directory) if name.startswith(prefix))
+        for name in old[:max(0, len(old) - self.backups)]:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+    def _run(self):
+        closing = False
+
+        while not closing:
+            try:
+                batch = [self.queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+
+            # take whatever else is already queued
+            while len(batch) < 1000:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if None in batch:
+                closing = True
+                batch = [p for p in batch if p is not None]
+
+            if not batch:
+                continue
+
+            try:
+                if self.file is None:
+                    self._open()
+                self.file.write("".join(line + "\n" for line in batch))   # <-- one JSON per line
+                self.file.flush()
+
+                if self._should_rotate():
+                    self._rotate()
+            except Exception as e:
+                print(f"[WARN] JSON log write failed: {e}")
+
+        if self.file is not None:
+            self.file.close()
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+def get_log_writer(path: str) -> JSONLogWriter:
+    """One writer (thread + file handle) per log file, shared by all middleware instances."""
+    path = os.path.abspath(path)
+    with _writers_lock:
+        writer = _writers.get(path)
+        if writer is None:
+            writer = _writers[path] = JSONLogWriter(path)
+        return writer
 
 
 class JSONLoggingMiddleware(AgentMiddleware):
@@ -28,21 +196,15 @@ class JSONLoggingMiddleware(AgentMiddleware):
 
     def __init__(self, output_file: str | None = None):
         self.output_file = output_file
+        self.writer = get_log_writer(output_file) if output_file else None
 
     def _emit(self, payload: dict):
-        payload["timestamp"] = datetime.utcnow().isoformat() + "Z"
-
-        text = json.dumps(
-            payload,
-            ensure_ascii=False,   # keep real characters instead of \u2019
-            separators=(",", ":") # compact JSON, stable formatting
-        )
+        payload["timestamp"] = datetime.now(timezone.utc).replace(tzinfo=None).isoformat() + "Z"
 
-        if self.output_file:
-            with open(self.output_file, "a") as f:
-                f.write(text + "\n")   # <-- one JSON per line
+        if self.writer is not None:
+            self.writer.write(payload)
         else:
-            print(text)
+            print(_encode(payload))
 
     # ---- BEFORE MODEL ----
     def before_model(self, state: AgentState, runtime) -> dict | None:
@@ -62,7 +224,7 @@ class JSONLoggingMiddleware(AgentMiddleware):
 
         self._emit({
             "phase": "after_model",
-            "last_message": _serialize(last),
+            "last_message": last,
         })
         return None
 
@@ -71,15 +233,15 @@ class JSONLoggingMiddleware(AgentMiddleware):
     def log_model(self, request, handler):
         self._emit({
             "phase": "wrap_model_call_start",
-            "model": _serialize(getattr(request, "model", None)),
-            "inputs": _serialize(getattr(request, "inputs", None)),
+            "model": getattr(request, "model", None),
+            "inputs": getattr(request, "inputs", None),
         })
 
         result = handler(request)
 
         self._emit({
             "phase": "wrap_model_call_end",
-            "outputs": _serialize(getattr(result, "output", None)),
+            "outputs": getattr(result, "output", None),
         })
 
         return result
@@ -90,7 +252,7 @@ class JSONLoggingMiddleware(AgentMiddleware):
         self._emit({
             "phase": "wrap_tool_call_start",
             "tool_name": request.tool_call.get("name"),
-            "tool_args": _serialize(request.tool_call.get("args", {})),
+            "tool_args": request.tool_call.get("args", {}),
         })
 
         result = handler(request)
@@ -98,7 +260,7 @@ class JSONLoggingMiddleware(AgentMiddleware):
         self._emit({
             "phase": "wrap_tool_call_end",
             "tool_name": request.tool_call.get("name"),
-            "tool_result": _serialize(getattr(result, "output", None)),
+            "tool_result": getattr(result, "output", None),
         })
 
         return result
@@ -1,25 +1,119 @@
 from langchain.agents.middleware import AgentMiddleware, AgentState
+from collections import OrderedDict, deque
 import json
+import threading
 import time
 
 
+def _thread_id():
+    try:
+        from langgraph.config import get_config
+        return str(get_config()["configurable"].get("thread_id", ""))
+    except Exception:
+        return ""
+
+
 class TokenDebugMiddleware(AgentMiddleware):
-    def __init__(self, tokenizer, verbose=True):
+    """
+    Token accounting for the agent state.
+
+    Each message is tokenized once (memoized by message id); the history
+    total is kept per thread and only the appended messages are counted
+    on the next hook. Per-turn prompt/completion totals are kept in
+    self.turns and published to the tracer's metrics.
+    """
+
+    def __init__(self, tokenizer, verbose=True, cache_size=4096, max_threads=256):
         self.tokenizer = tokenizer
         self.verbose = verbose
+        self.cache_size = cache_size
+        self.max_threads = max_threads
+
+        self.counts = OrderedDict()   # message id -> tokens
+        self.history = OrderedDict()  # thread_id -> (message ids, total tokens), LRU
+        self.current = OrderedDict()  # thread_id -> running turn totals, LRU
+        self.turns = deque(maxlen=100)
+        self.lock = threading.Lock()
+
+    def _remember(self, table, thread_id, value):
+        """Store per-thread state, dropping the least recently used threads. Caller holds self.lock."""
+        table.pop(thread_id, None)
+        table[thread_id] = value
+        while len(table) > self.max_threads:
+            table.popitem(last=False)
+
+    def _tokens(self, text: str) -> int:
+        try:
+            return self.tokenizer(text)
+        except Exception:
+            return len(text) // 4   # tokenizer unavailable: ~4 chars per token
+
+    def _count_message(self, m):
+        msg_id = getattr(m, "id", None)
+
+        if msg_id is not None:
+            with self.lock:
+                tok = self.counts.get(msg_id)
+                if tok is not None:
+                    self.counts.move_to_end(msg_id)
+                    return tok
+
+        role = getattr(m, "type", "unknown")
+        content = getattr(m, "content", "")
+        tok = self._tokens(f"{role}: {content}\n")
+
+        if msg_id is not None:
+            with self.lock:
+                self.counts[msg_id] = tok
+                while len(self.counts) > self.cache_size:
+                    self.counts.popitem(last=False)
+
+        return tok
 
     def count_tokens(self, messages):
-        """Token count for LC message objects."""
+        """Token count for LC message objects, updated incrementally per thread."""
         if not messages:
             return 0
 
-        text = ""
-        for m in messages:
-            role = getattr(m, "type", "unknown")
-            content = getattr(m, "content", "")
-            text += f"{role}: {content}\n"
-
-        return self.tokenizer(text)
+        thread_id = _thread_id()
+        ids = [getattr(m, "id", None) for m in messages]
+
+        with self.lock:
+            prev_ids, prev_total = self.history.get(thread_id, ((), 0))
+
+        n = len(prev_ids)
+        if n and None not in prev_ids and ids[:n] == list(prev_ids):
+            # only appended messages are new
+            total = prev_total + sum(self._count_message(m) for m in messages[n:])
+        else:
+            # removed / replaced messages: re-sum, cached counts make this cheap
+            total = sum(self._count_message(m) for m in messages)
+
+        with self.lock:
+            self._remember(self.history, thread_id, (tuple(ids), total))
+
+        return total
+
+    # ---- metrics ---- #
+
+    def _publish(self, turn):
+        self.turns.append(turn)
+        try:
+            from debug.tracing import get_tracer
+            tracer = get_tracer()
+            if tracer.enabled:
+                tracer.stats.record("tokens.prompt", turn["prompt_tokens"])
+                tracer.stats.record("tokens.completion", turn["completion_tokens"])
+        except Exception:
+            pass
+
+    def summary(self):
+        turns = list(self.turns)
+        return {
+            "turns": len(turns),
+            "last_turn": turns[-1] if turns else None,
+            "cached_messages": len(self.counts),
+        }
 
     # ---- HOOKS ---- #
 
@@ -27,6 +121,15 @@ class TokenDebugMiddleware(AgentMiddleware):
         msgs = state.get("messages", [])
         tok = self.count_tokens(msgs)
 
+        with self.lock:
+            self._remember(self.current, _thread_id(), {
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "model_calls": 0,
+                "history_tokens": tok,
+                "exact": True,
+            })
+
         if self.verbose:
             print("\n=== 🟧 TOKEN DEBUG (before agent) ===")
             print(f"Token count entering middleware chain: {tok}")
@@ -50,8 +153,24 @@ class TokenDebugMiddleware(AgentMiddleware):
 
     def after_model(self, state: AgentState, runtime):
         msgs = state.get("messages", [])
+        with self.lock:
+            before = self.history.get(_thread_id(), ((), 0))[1]
         tok = self.count_tokens(msgs)
 
+        # prefer the server's usage numbers, fall back to our estimate
+        usage = getattr(msgs[-1], "usage_metadata", None) if msgs else None
+        with self.lock:
+            turn = self.current.get(_thread_id())
+            if turn is not None:
+                turn["model_calls"] += 1
+                if usage:
+                    turn["prompt_tokens"] += usage.get("input_tokens", 0)
+                    turn["completion_tokens"] += usage.get("output_tokens", 0)
+                else:
+                    turn["exact"] = False
+                    turn["prompt_tokens"] += before
+                    turn["completion_tokens"] += max(0, tok - before)
+
         if self.verbose:
             print("\n=== 🟩 TOKEN DEBUG (after model) ===")
             print(json.dumps({
@@ -67,8 +186,17 @@ class TokenDebugMiddleware(AgentMiddleware):
         msgs = state.get("messages", [])
         tok = self.count_tokens(msgs)
 
+        with self.lock:
+            turn = self.current.pop(_thread_id(), None)
+        if turn is not None:
+            turn["history_tokens"] = tok
+            turn["timestamp"] = time.time()
+            self._publish(turn)
+
         if self.verbose:
             print("\n=== 🟥 TOKEN DEBUG (after agent) ===")
             print(f"Token count after middleware chain: {tok}")
+            if turn is not None:
+                print(f"Turn: {turn['prompt_tokens']} prompt + {turn['completion_tokens']} completion tokens")
 
         return None
@@ -1,8 +1,26 @@
 # debug/tool_calls.py
 
-TOOL_CALL_LOG = []
-
 import datetime
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+
+from langchain.agents.middleware import AgentMiddleware
+
+TOOL_LOG_SIZE = 500        # entries kept in the ring buffer
+TOOL_LATENCY_WINDOW = 200  # latency samples per tool for p50/p95
+
+# Newest first. Appending to a full deque drops the oldest entry in O(1).
+TOOL_CALL_LOG = deque(maxlen=TOOL_LOG_SIZE)
+TOOL_STATS = {}            # tool name -> aggregate counters
+_lock = threading.Lock()
+_seq = 0
+
+# Set by ToolUsageMiddleware while a tool runs, so failures the tool logs
+# itself are counted once per call
+_current_call = ContextVar("atom_tool_call", default=None)
+
 
 def _sanitize(value):
     if isinstance(value, datetime.datetime):
@@ -14,26 +32,163 @@ def _sanitize(value):
     return value
 
 
+def _now():
+    return datetime.datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
+
+
+def _stats_for(tool_name):
+    """Caller holds _lock."""
+    stats = TOOL_STATS.get(tool_name)
+    if stats is None:
+        stats = TOOL_STATS[tool_name] = {
+            "calls": 0,
+            "failures": 0,
+            "total_ms": 0.0,
+            "latencies": deque(maxlen=TOOL_LATENCY_WINDOW),
+            "last_called": None,
+        }
+    return stats
+
+
 def record_tool_call(tool_name, metadata=None, success=True):
+    global _seq
+
     if metadata is None:
         metadata = {}
 
     metadata = _sanitize(metadata)
+    timestamp = _now()
+
+    call = _current_call.get()
+    if call is not None and not success:
+        call["failed"] = True
+
+    with _lock:
+        _seq += 1
+        entry = {
+            "id": _seq,
+            "tool": tool_name,
+            "metadata": {
+                "success": success,
+                "tags": metadata.get("tags", "General"),
+                **{k: v for k, v in metadata.items() if k != "tags"}
+            },
+            "timestamp": timestamp
+        }
+        TOOL_CALL_LOG.appendleft(entry)
+
+        # no middleware around this call: count straight from the log
+        if call is None:
+            stats = _stats_for(tool_name)
+            stats["last_called"] = timestamp
+            if success:
+                stats["calls"] += 1
+            else:
+                stats["failures"] += 1
 
-    entry = {
-        "tool": tool_name,
-        "metadata": {
-            "success": success,
-            "tags": metadata.get("tags", "General"),
-            **{k: v for k, v in metadata.items() if k != "tags"}
-        },
-        "timestamp": datetime.datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
-    }
 
-    TOOL_CALL_LOG.insert(0, entry)
+def observe_tool_call(tool_name, duration_ms, success=True):
+    """One finished tool call, as timed by ToolUsageMiddleware."""
+    with _lock:
+        stats = _stats_for(tool_name)
+        stats["calls"] += 1
+        stats["total_ms"] += duration_ms
+        stats["latencies"].append(duration_ms)
+        stats["last_called"] = _now()
+        if not success:
+            stats["failures"] += 1
 
-    if len(TOOL_CALL_LOG) > 50:
-        TOOL_CALL_LOG.pop()
 
 def get_tool_log():
-    return TOOL_CALL_LOG
+    """Snapshot of the log, newest first."""
+    with _lock:
+        return list(TOOL_CALL_LOG)
+
+
+def query_tool_log(tool=None, success=None, tag=None, since=None, offset=0, limit=50):
+    """Filtered page of the log (newest first) and the number of matching entries."""
+    matches = []
+    for entry in get_tool_log():
+        meta = entry.get("metadata", {})
+        if tool and entry.get("tool") != tool:
+            continue
+        if success is not None and bool(meta.get("success", True)) != success:
+            continue
+        if tag and meta.get("tags") != tag:
+            continue
+        if since and entry.get("timestamp", "") < since:
+            continue
+        matches.append(entry)
+
+    return matches[offset:offset + limit], len(matches)
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, round(q * (len(values) - 1)))], 2)
+
+
+def get_tool_stats():
+    with _lock:
+        snapshot = {name: {**s, "latencies": list(s["latencies"])} for name, s in TOOL_STATS.items()}
+
+    tools = {}
+    for name, s in sorted(snapshot.items()):
+        timed = len(s["latencies"])
+        tools[name] = {
+            "calls": s["calls"],
+            "failures": s["failures"],
+            "failure_rate": round(s["failures"] / s["calls"], 3) if s["calls"] else 0.0,
+            "total_ms": round(s["total_ms"], 2),
+            "avg_ms": round(sum(s["latencies"]) / timed, 2) if timed else None,
+            "p50_ms": _percentile(s["latencies"], 0.50),
+            "p95_ms": _percentile(s["latencies"], 0.95),
+            "last_called": s["last_called"],
+        }
+    return tools
+
+
+class ToolUsageMiddleware(AgentMiddleware):
+    """
+    Times every tool call (retries included) for the per-tool stats.
+    A call fails if it raises, returns an error ToolMessage, or the tool
+    logs success=False itself.
+    """
+
+    def _finish(self, request, start, call, result=None, error=None):
+        failed = call["failed"] or error is not None or getattr(result, "status", None) == "error"
+        observe_tool_call(
+            request.tool_call.get("name", "unknown_tool"),
+            (time.perf_counter() - start) * 1000,
+            success=not failed,
+        )
+
+    def wrap_tool_call(self, request, handler):
+        call = {"failed": False}
+        token = _current_call.set(call)
+        start = time.perf_counter()
+        try:
+            result = handler(request)
+        except Exception as e:
+            self._finish(request, start, call, error=e)
+            raise
+        finally:
+            _current_call.reset(token)
+        self._finish(request, start, call, result)
+        return result
+
+    async def awrap_tool_call(self, request, handler):
+        call = {"failed": False}
+        token = _current_call.set(call)
+        start = time.perf_counter()
+        try:
+            result = await handler(request)
+        except Exception as e:
+            self._finish(request, start, call, error=e)
+            raise
+        finally:
+            _current_call.reset(token)
+        self._finish(request, start, call, result)
+        return result
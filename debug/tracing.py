@@ -0,0 +1,510 @@
+# debug/tracing.py
+
+import functools
+import inspect
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+
+import yaml
+from langchain.agents.middleware import AgentMiddleware
+from langchain_core.callbacks import BaseCallbackHandler
+
+try:
+    with open("config.yaml", "r") as f:
+        config = yaml.safe_load(f) or {}
+except Exception as e:
+    print(f"[ERROR] Failed to load configuration: {e}")
+    config = {}
+
+tracing_cfg = config.get("TRACING", {}) or {}
+
+TRACING_ENABLED = bool(tracing_cfg.get("ENABLED", True))
+# OTLP/JSON export, one ExportTraceServiceRequest per line ("" = no export),
+# rotated like the agent JSON log
+TRACING_EXPORT_FILE = tracing_cfg.get("EXPORT_FILE", "atom_traces.jsonl")
+# Samples per span name kept for the p50/p95 summary
+TRACING_WINDOW = int(tracing_cfg.get("WINDOW", 500))
+# Turns still open after this many seconds are exported as aborted
+TRACING_TURN_TIMEOUT = float(tracing_cfg.get("TURN_TIMEOUT", 600))
+
+SERVICE_NAME = "atom"
+
+# Hooks that get a span, sync and async
+HOOKS = (
+    "before_agent", "abefore_agent",
+    "before_model", "abefore_model",
+    "after_model", "aafter_model",
+    "after_agent", "aafter_agent",
+    "wrap_model_call", "awrap_model_call",
+    "wrap_tool_call", "awrap_tool_call",
+)
+
+ASYNC_HOOKS = {hook for hook in HOOKS if hook.startswith("a") and hook[1:] in HOOKS}
+
+_current_span = ContextVar("atom_current_span", default=None)
+
+# Wall clock anchor so monotonic span times can be exported as unix time
+_WALL_NS = time.time_ns()
+_MONO_NS = time.perf_counter_ns()
+
+
+def _unix_ns(mono_ns: int) -> int:
+    return _WALL_NS + (mono_ns - _MONO_NS)
+
+
+def _thread_id() -> str:
+    try:
+        from langgraph.config import get_config
+        return str(get_config()["configurable"].get("thread_id", ""))
+    except Exception:
+        return ""
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    i = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[i]
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start", "end", "attributes", "error")
+
+    def __init__(self, trace, name, parent_id=None, attributes=None):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.perf_counter_ns()
+        self.end = None
+        self.attributes = attributes or {}
+        self.error = None
+
+    @property
+    def duration_ms(self):
+        return ((self.end or time.perf_counter_ns()) - self.start) / 1e6
+
+    def to_otlp(self):
+        span = {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,  # INTERNAL
+            "startTimeUnixNano": str(_unix_ns(self.start)),
+            "endTimeUnixNano": str(_unix_ns(self.end or self.start)),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class Trace:
+    """All spans of one agent turn."""
+
+    def __init__(self, thread_id):
+        self.trace_id = os.urandom(16).hex()
+        self.thread_id = thread_id
+        self.spans = []
+        self.lock = threading.Lock()
+        self.root = self.add(Span(self, "agent.turn", attributes={"thread.id": thread_id}))
+
+    def add(self, span):
+        with self.lock:
+            self.spans.append(span)
+        return span
+
+
+class LatencyStats:
+    """Rolling window of durations per span name."""
+
+    def __init__(self, window=TRACING_WINDOW):
+        self.samples = defaultdict(lambda: deque(maxlen=window))
+        self.lock = threading.Lock()
+
+    def record(self, name, value):
+        with self.lock:
+            self.samples[name].append(value)
+
+    def summary(self):
+        with self.lock:
+            snapshot = {name: sorted(values) for name, values in self.samples.items()}
+
+        return {
+            name: {
+                "count": len(values),
+                "p50": round(_percentile(values, 0.50), 2),
+                "p95": round(_percentile(values, 0.95), 2),
+                "max": round(values[-1], 2),
+            }
+            for name, values in sorted(snapshot.items())
+            if values
+        }
+
+
+class _TraceExporter:
+    """
+    Appends finished traces to the export file through the rotating
+    background writer used for the agent JSON log (LOGGING settings).
+    """
+
+    def __init__(self, path):
+        from debug.json_logging_middleware import get_log_writer
+        self.path = path
+        self.writer = get_log_writer(path)
+
+    def export(self, trace):
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+                "scopeSpans": [{
+                    "scope": {"name": "atom.tracing"},
+                    "spans": [span.to_otlp() for span in trace.spans],
+                }],
+            }]
+        }
+        self.writer.write(payload)   # drops the trace if the queue is full
+
+
+class TraceCallbackHandler(BaseCallbackHandler):
+    """Model-level span with time to first token and tokens/sec."""
+
+    run_inline = True
+
+    def __init__(self, tracer):
+        self.tracer = tracer
+        self.runs = {}   # run_id -> [span, first_token_ns, chunks]
+        self.lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        thread_id = str((metadata or {}).get("thread_id", "")) or _thread_id()
+        span = self.tracer.start_span("llm.generate", thread_id, {
+            "llm.input_messages": sum(len(m) for m in messages),
+        })
+        with self.lock:
+            self.runs[run_id] = [span, None, 0]
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        with self.lock:
+            run = self.runs.get(run_id)
+            if run is None:
+                return
+            if run[1] is None:
+                run[1] = time.perf_counter_ns()
+            run[2] += 1
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        with self.lock:
+            run = self.runs.pop(run_id, None)
+        if run is None:
+            return
+
+        span, first_token, chunks = run
+        output_tokens = chunks
+        try:
+            usage = response.generations[0][0].message.usage_metadata or {}
+            output_tokens = usage.get("output_tokens") or chunks
+        except Exception:
+            pass
+
+        self.tracer.end_span(span)
+
+        if first_token is not None:
+            ttft = (first_token - span.start) / 1e6
+            span.attributes["llm.ttft_ms"] = round(ttft, 2)
+            self.tracer.stats.record("llm.ttft_ms", ttft)
+
+            gen_sec = (span.end - first_token) / 1e9
+            if output_tokens and gen_sec > 0:
+                tps = output_tokens / gen_sec
+                span.attributes["llm.tokens_per_sec"] = round(tps, 2)
+                self.tracer.stats.record("llm.tokens_per_sec", tps)
+
+        span.attributes["llm.output_tokens"] = output_tokens
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self.lock:
+            run = self.runs.pop(run_id, None)
+        if run is not None:
+            self.tracer.end_span(run[0], error=error)
+
+
+class TracingMiddleware(AgentMiddleware):
+    """
+    Opens the turn trace in before_agent and closes it in after_agent (runs
+    last). A model call that raises or is cancelled ends the run without
+    after_agent, so the outermost model wrapper closes the trace then.
+    """
+
+    def __init__(self, tracer):
+        super().__init__()
+        self.tracer = tracer
+
+    def before_agent(self, state, runtime):
+        self.tracer.begin_turn(_thread_id())
+        return None
+
+    def after_agent(self, state, runtime):
+        self.tracer.end_turn(_thread_id())
+        return None
+
+    def wrap_model_call(self, request, handler):
+        try:
+            return handler(request)
+        except BaseException as e:
+            self.tracer.end_turn(_thread_id(), error=e)
+            raise
+
+    async def awrap_model_call(self, request, handler):
+        try:
+            return await handler(request)
+        except BaseException as e:   # includes asyncio.CancelledError
+            self.tracer.end_turn(_thread_id(), error=e)
+            raise
+
+
+class Tracer:
+    """
+    Latency tracing for the agent.
+
+    instrument() wraps every hook of every middleware in a span (monotonic
+    clock), the callback handler adds model spans with TTFT and tokens/sec,
+    and the tool itself (the handler of the innermost tool wrapper) is
+    recorded once per attempt so retries show up. Finished turns are exported as OTLP JSON and durations feed
+    the rolling p50/p95 summary. Turns that never reach after_agent are
+    exported as aborted once they are TRACING_TURN_TIMEOUT seconds old.
+    """
+
+    def __init__(self, enabled=TRACING_ENABLED, export_file=TRACING_EXPORT_FILE,
+                 turn_timeout=TRACING_TURN_TIMEOUT):
+        self.enabled = enabled
+        self.turn_timeout_ns = int(turn_timeout * 1e9)
+        self.active = {}        # thread_id -> Trace
+        self.lock = threading.Lock()
+        self.stats = LatencyStats()
+        self.exporter = _TraceExporter(export_file) if enabled and export_file else None
+        self.callback_handler = TraceCallbackHandler(self)
+
+    # ---- traces ----
+
+    def _trace(self, thread_id):
+        with self.lock:
+            trace = self.active.get(thread_id)
+            if trace is None:
+                trace = self.active[thread_id] = Trace(thread_id)
+            return trace
+
+    def begin_turn(self, thread_id):
+        cutoff = time.perf_counter_ns() - self.turn_timeout_ns
+        with self.lock:
+            stale = [t for t in self.active.values() if t.root.start < cutoff]
+            for trace in stale:
+                del self.active[trace.thread_id]
+            previous = self.active.pop(thread_id, None)
+            self.active[thread_id] = Trace(thread_id)
+
+        if previous is not None:
+            stale.append(previous)   # the last turn of this thread never finished
+        for trace in stale:
+            self._finish(trace, error=TimeoutError("turn did not finish"))
+
+    def end_turn(self, thread_id, error=None):
+        with self.lock:
+            trace = self.active.pop(thread_id, None)
+        if trace is not None:
+            self._finish(trace, error=error)
+
+    def _finish(self, trace, error=None):
+        self.end_span(trace.root, error=error)
+        if error is not None:
+            trace.root.attributes["turn.aborted"] = True
+
+        tools = [s for s in trace.spans if s.name.startswith("tool.") and s.name != "tool.attempt"]
+        trace.root.attributes["turn.tool_calls"] = len(tools)
+
+        if self.exporter:
+            self.exporter.export(trace)
+
+    def start_span(self, name, thread_id=None, attributes=None):
+        trace = self._trace(_thread_id() if thread_id is None else thread_id)
+        parent = _current_span.get()
+        parent_id = parent.span_id if parent is not None and parent.trace is trace else trace.root.span_id
+        return trace.add(Span(trace, name, parent_id, attributes))
+
+    def end_span(self, span, error=None):
+        span.end = time.perf_counter_ns()
+        if error is not None:
+            span.error = f"{type(error).__name__}: {error}"
+        self.stats.record(span.name, span.duration_ms)
+
+    def summary(self):
+        return {
+            "enabled": self.enabled,
+            "active_turns": len(self.active),
+            "spans_ms": self.stats.summary(),
+        }
+
+    # ---- instrumentation ----
+
+    def _span_attributes(self, middleware, hook, args):
+        attributes = {"middleware": middleware.name, "hook": hook}
+        if "tool_call" in hook and args:
+            call = getattr(args[0], "tool_call", None) or {}
+            attributes["tool.name"] = call.get("name", "")
+            attributes["tool.call_id"] = call.get("id", "")
+        return attributes
+
+    def _start_hook_span(self, middleware, hook, span_name, args):
+        attributes = self._span_attributes(middleware, hook, args)
+        if "{tool}" in span_name:
+            span_name = span_name.format(tool=attributes.get("tool.name") or "unknown")
+        return self.start_span(span_name, attributes=attributes)
+
+    def _end_hook_span(self, span, error=None):
+        self.end_span(span, error=error)
+
+        # whole tool call: count the attempts recorded underneath it
+        call_id = span.attributes.get("tool.call_id")
+        if call_id and span.name != "tool.attempt":
+            with span.trace.lock:
+                attempts = sum(
+                    1 for s in span.trace.spans
+                    if s.name == "tool.attempt" and s.attributes.get("tool.call_id") == call_id
+                )
+            span.attributes["tool.attempts"] = attempts
+            span.attributes["tool.retries"] = max(0, attempts - 1)
+
+    def _wrap_attempts(self, middleware, hook, func):
+        """Trace every call of the handler `func` receives as a tool.attempt span."""
+        tracer = self
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def traced(request, handler):
+                async def attempt(req):
+                    span = tracer._start_hook_span(middleware, hook, "tool.attempt", (req,))
+                    token = _current_span.set(span)
+                    try:
+                        result = await handler(req)
+                    except Exception as e:
+                        tracer.end_span(span, error=e)
+                        raise
+                    finally:
+                        _current_span.reset(token)
+                    tracer.end_span(span)
+                    return result
+
+                return await func(request, attempt)
+        else:
+            @functools.wraps(func)
+            def traced(request, handler):
+                def attempt(req):
+                    span = tracer._start_hook_span(middleware, hook, "tool.attempt", (req,))
+                    token = _current_span.set(span)
+                    try:
+                        result = handler(req)
+                    except Exception as e:
+                        tracer.end_span(span, error=e)
+                        raise
+                    finally:
+                        _current_span.reset(token)
+                    tracer.end_span(span)
+                    return result
+
+                return func(request, attempt)
+
+        return traced
+
+    def _wrap(self, middleware, hook, func, span_name):
+        tracer = self
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def traced(*args, **kwargs):
+                span = tracer._start_hook_span(middleware, hook, span_name, args)
+                token = _current_span.set(span)
+                try:
+                    result = await func(*args, **kwargs)
+                except Exception as e:
+                    tracer._end_hook_span(span, error=e)
+                    raise
+                finally:
+                    _current_span.reset(token)
+                tracer._end_hook_span(span)
+                return result
+        else:
+            @functools.wraps(func)
+            def traced(*args, **kwargs):
+                span = tracer._start_hook_span(middleware, hook, span_name, args)
+                token = _current_span.set(span)
+                try:
+                    result = func(*args, **kwargs)
+                except Exception as e:
+                    tracer._end_hook_span(span, error=e)
+                    raise
+                finally:
+                    _current_span.reset(token)
+                tracer._end_hook_span(span)
+                return result
+
+        return traced
+
+    def instrument(self, middleware):
+        """
+        Return the middleware list with every overridden hook traced and
+        a TracingMiddleware in front. Hooks are replaced on the instances,
+        which is what create_agent() picks up.
+        """
+        if not self.enabled:
+            return list(middleware)
+
+        def overrides(m, hook):
+            return getattr(type(m), hook, None) is not getattr(AgentMiddleware, hook)
+
+        tool_wrappers = [m for m in middleware if overrides(m, "wrap_tool_call") or overrides(m, "awrap_tool_call")]
+        innermost_tool = tool_wrappers[-1] if tool_wrappers else None
+
+        for m in middleware:
+            for hook in HOOKS:
+                if not overrides(m, hook):
+                    continue
+
+                func = getattr(m, hook)
+                if m is innermost_tool and "tool_call" in hook:
+                    func = self._wrap_attempts(m, hook, func)
+
+                if tool_wrappers and m is tool_wrappers[0] and "tool_call" in hook:
+                    span_name = "tool.{tool}"       # whole tool call, retries included
+                else:
+                    # sync and async variants share one span name
+                    span_name = f"{m.name}.{hook[1:] if hook in ASYNC_HOOKS else hook}"
+
+                setattr(m, hook, self._wrap(m, hook, func, span_name))
+
+        return [TracingMiddleware(self)] + list(middleware)
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+def get_tracer():
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                _tracer = Tracer()
+    return _tracer
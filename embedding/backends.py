@@ -0,0 +1,132 @@
+# embedding/backends.py
+#
+# SentenceTransformer loading for the embedding server and its benchmark.
+# Backend, model and thread count come from the EMBEDDING section of
+# config.yaml; EMBEDDING_MODEL / EMBEDDING_BACKEND / EMBEDDING_THREADS
+# environment variables override it.
+
+import logging
+import os
+import platform
+
+import numpy as np
+import yaml
+
+logger = logging.getLogger(__name__)
+
+try:
+    with open("config.yaml", "r") as f:
+        config = yaml.safe_load(f) or {}
+except Exception:
+    config = {}   # the embedding server can run without the ATOM config
+
+embedding_cfg = config.get("EMBEDDING", {}) or {}
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", embedding_cfg.get("MODEL", "sentence-transformers/all-MiniLM-L6-v2"))
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", embedding_cfg.get("BACKEND", "torch"))     # torch | onnx | onnx-int8
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", embedding_cfg.get("THREADS", 0)))     # 0 = library default
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", embedding_cfg.get("ONNX_FILE", ""))   # override the .onnx file
+EMBEDDING_MIN_COSINE = float(os.getenv("EMBEDDING_MIN_COSINE", embedding_cfg.get("MIN_COSINE", 0.98)))
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+# Sentences the self-check and the benchmark embed
+CHECK_SENTENCES = [
+    "Remind me to water the plants tomorrow morning.",
+    "The user prefers metric units and short answers.",
+    "What's the weather like in Berlin this weekend?",
+    "Turn off the living room lights.",
+    "My sister's birthday is on the 14th of March.",
+    "Summarize the last three news articles about robotics.",
+    "I started learning the piano two months ago.",
+    "Set a timer for twenty minutes.",
+]
+
+
+def default_onnx_file(backend: str) -> str:
+    """ONNX file inside the model repo (the sentence-transformers repos ship these)."""
+    if EMBEDDING_ONNX_FILE:
+        return EMBEDDING_ONNX_FILE
+    if backend == "onnx":
+        return "onnx/model.onnx"
+
+    machine = platform.machine().lower()
+    if machine in ("arm64", "aarch64"):
+        return "onnx/model_qint8_arm64.onnx"
+    return "onnx/model_quint8_avx2.onnx"   # runs on any x86-64 with AVX2
+
+
+def load_model(name: str = EMBEDDING_MODEL, backend: str = EMBEDDING_BACKEND, threads: int = EMBEDDING_THREADS):
+    """SentenceTransformer on CPU for the given backend."""
+    from sentence_transformers import SentenceTransformer
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}', expected one of {BACKENDS}")
+
+    if backend == "torch":
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        return SentenceTransformer(name, device="cpu")
+
+    # ONNX Runtime (needs: pip install "sentence-transformers[onnx]")
+    model_kwargs = {
+        "file_name": default_onnx_file(backend),
+        "provider": "CPUExecutionProvider",
+    }
+    if threads:
+        import onnxruntime
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        model_kwargs["session_options"] = options
+
+    return SentenceTransformer(name, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+
+
+def cosine_agreement(a, b) -> dict:
+    """Row-wise cosine similarity between two embedding matrices."""
+    a = np.asarray(a, dtype=np.float32)
+    b = np.asarray(b, dtype=np.float32)
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    cos = (a * b).sum(axis=1)
+    return {"min_cosine": round(float(cos.min()), 5), "mean_cosine": round(float(cos.mean()), 5)}
+
+
+def self_check(model, name: str = EMBEDDING_MODEL, threads: int = EMBEDDING_THREADS, reference=None) -> dict:
+    """Compare `model` against the PyTorch model on CHECK_SENTENCES."""
+    if reference is None:
+        reference = load_model(name, "torch", threads)
+    result = cosine_agreement(model.encode(CHECK_SENTENCES), reference.encode(CHECK_SENTENCES))
+    result["passed"] = result["min_cosine"] >= EMBEDDING_MIN_COSINE
+    return result
+
+
+def load_checked_model(name: str = EMBEDDING_MODEL, backend: str = EMBEDDING_BACKEND, threads: int = EMBEDDING_THREADS):
+    """
+    Load the configured backend and verify it against PyTorch.
+    Falls back to PyTorch if the backend can't load or drifts below
+    EMBEDDING_MIN_COSINE, so stored vectors stay comparable.
+    Returns (model, active backend, self-check result or None).
+    """
+    if backend == "torch":
+        return load_model(name, "torch", threads), "torch", None
+
+    try:
+        model = load_model(name, backend, threads)
+    except Exception as e:
+        logger.error(f"❌ Failed to load {backend} backend ({e}), falling back to torch")
+        return load_model(name, "torch", threads), "torch", None
+
+    reference = load_model(name, "torch", threads)
+    check = self_check(model, name, threads, reference=reference)
+    check["backend"] = backend
+
+    if not check["passed"]:
+        logger.warning(
+            f"⚠️ {backend} backend min cosine {check['min_cosine']} < {EMBEDDING_MIN_COSINE}, falling back to torch"
+        )
+        return reference, "torch", check
+
+    logger.info(f"✅ {backend} backend self-check: min cosine {check['min_cosine']}")
+    return model, backend, check
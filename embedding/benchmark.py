@@ -0,0 +1,56 @@
+# embedding/benchmark.py
+#
+# Sentences/sec per embedding backend, with cosine agreement against PyTorch.
+# Run from the project root:  python -m embedding.benchmark [--backends torch,onnx,onnx-int8]
+
+import argparse
+import time
+
+from embedding.backends import (
+    BACKENDS,
+    CHECK_SENTENCES,
+    EMBEDDING_MODEL,
+    EMBEDDING_THREADS,
+    cosine_agreement,
+    load_model,
+)
+
+
+def bench(model, sentences, batch_size, runs):
+    model.encode(sentences[:batch_size], batch_size=batch_size)   # warm-up
+    start = time.perf_counter()
+    for _ in range(runs):
+        model.encode(sentences, batch_size=batch_size)
+    return len(sentences) * runs / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--threads", type=int, default=EMBEDDING_THREADS)
+    parser.add_argument("--sentences", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    sentences = [CHECK_SENTENCES[i % len(CHECK_SENTENCES)] + f" ({i})" for i in range(args.sentences)]
+    reference = None
+
+    print(f"Model: {args.model}, {args.sentences} sentences x {args.runs} runs, "
+          f"batch size {args.batch_size}, threads {args.threads or 'default'}\n")
+
+    for backend in args.backends.split(","):
+        backend = backend.strip()
+        try:
+            model = load_model(args.model, backend, args.threads)
+        except Exception as e:
+            print(f"{backend:10s} failed to load: {e}")
+            continue
+
+        if reference is None:
+            reference = load_model(args.model, "torch", args.threads).encode(CHECK_SENTENCES)
+
+        rate = bench(model, sentences, args.batch_size, args.runs)
+        check = cosine_agreement(model.encode(CHECK_SENTENCES), reference)
+        print(f"{backend:10s} {rate:10.1f} sentences/s   min cosine vs torch {check['min_cosine']:.5f}")
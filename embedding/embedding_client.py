@@ -1,19 +1,278 @@
-import openai
+import abc
+import asyncio
+import base64
+import hashlib
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
 from typing import List
 
-class FastAPIEmbeddings:
-    def __init__(self, base_url: str, api_key: str = "not-needed"):
+import httpx
+import numpy as np
+import openai
+import yaml
+
+try:
+    with open("config.yaml", "r") as f:
+        config = yaml.safe_load(f) or {}
+except Exception as e:
+    print(f"[ERROR] Failed to load configuration: {e}")
+    config = {}
+
+embedding_cfg = config.get("EMBEDDING", {}) or {}
+
+EMBEDDING_CACHE_SIZE = int(embedding_cfg.get("CACHE_SIZE", 4096))        # vectors kept in the LRU
+EMBEDDING_BATCH_WINDOW_MS = float(embedding_cfg.get("BATCH_WINDOW_MS", 5))  # wait for more texts to batch
+EMBEDDING_MAX_BATCH = int(embedding_cfg.get("MAX_BATCH", 64))            # texts per /v1/embeddings call
+EMBEDDING_TRANSPORT = embedding_cfg.get("TRANSPORT", "binary")           # binary | base64
+EMBEDDING_WIRE_DTYPE = embedding_cfg.get("WIRE_DTYPE", "float32")        # binary transport: float32 | float16
+
+WIRE_DTYPES = {"float32": np.dtype("<f4"), "float16": np.dtype("<f2")}
+
+
+def text_key(text: str) -> str:
+    """Cache key: hash of the whitespace-normalized text."""
+    normalized = " ".join(str(text).split())
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class CachedEmbeddings(abc.ABC):
+    """
+    LangChain-style embeddings on top of a batch embed function (_fetch).
+
+    - LRU cache of vectors keyed by text_key(), so the same memory or user
+      message is embedded once, not once per middleware.
+    - Concurrent callers asking for the same uncached text share one
+      in-flight request.
+    - Uncached texts from concurrent callers are collected for
+      EMBEDDING_BATCH_WINDOW_MS and embedded together in one _fetch call,
+      always on the same worker thread.
+    - The cache holds read-only float32 arrays.
+    """
+
+    def __init__(self, cache_size=EMBEDDING_CACHE_SIZE, batch_window_ms=EMBEDDING_BATCH_WINDOW_MS,
+                 max_batch=EMBEDDING_MAX_BATCH):
+        self.cache_size = cache_size
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch = max(1, max_batch)
+
+        self.cache = OrderedDict()    # key -> vector (read-only float32 array)
+        self.inflight = {}            # key -> Future
+        self.lock = threading.Lock()
+
+        self.pending = queue.Queue()  # (key, text) waiting for a batch
+        self.worker = None
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.requests = 0
+        self.batched_texts = 0
+
+    # -----------------------------------------------------------
+    # Cache + coalescing
+    # -----------------------------------------------------------
+
+    def _lookup(self, texts):
+        """Cached vector or Future per text, queueing the ones nobody has asked for yet."""
+        results = []
+        new = []
+
+        with self.lock:
+            for text in texts:
+                key = text_key(text)
+
+                vector = self.cache.get(key)
+                if vector is not None:
+                    self.cache.move_to_end(key)
+                    self.hits += 1
+                    results.append(vector)
+                    continue
+
+                future = self.inflight.get(key)
+                if future is not None:
+                    self.coalesced += 1
+                else:
+                    self.misses += 1
+                    future = self.inflight[key] = Future()
+                    new.append((key, str(text)))
+                results.append(future)
+
+            if new and self.worker is None:
+                self.worker = threading.Thread(target=self._batch_loop, daemon=True)
+                self.worker.start()
+
+        for item in new:
+            self.pending.put(item)
+
+        return results
+
+    def _store(self, key, vector):
+        """Caller holds self.lock."""
+        self.cache[key] = vector
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    # -----------------------------------------------------------
+    # Micro-batching
+    # -----------------------------------------------------------
+
+    def _batch_loop(self):
+        while True:
+            batch = [self.pending.get()]
+
+            # give concurrent callers a moment to join this request
+            try:
+                while len(batch) < self.max_batch:
+                    batch.append(self.pending.get(timeout=self.batch_window))
+            except queue.Empty:
+                pass
+
+            self._send(batch)
+
+    @abc.abstractmethod
+    def _fetch(self, texts):
+        """(len(texts), dim) array of embeddings. Runs on the batch thread."""
+
+    def _send(self, batch):
+        keys = [key for key, _ in batch]
+        texts = [text for _, text in batch]
+
+        try:
+            vectors = np.asarray(self._fetch(texts)).astype(np.float32, copy=False)
+            if len(vectors) != len(keys):
+                raise RuntimeError(f"Expected {len(keys)} embeddings, got {len(vectors)}")
+        except Exception as e:
+            with self.lock:
+                futures = [self.inflight.pop(key, None) for key in keys]
+            for future in futures:
+                if future is not None:
+                    future.set_exception(e)
+            return
+
+        with self.lock:
+            self.requests += 1
+            self.batched_texts += len(keys)
+            futures, rows = [], []
+            for key, row in zip(keys, vectors):
+                # own copy per row so evicting one frees it
+                row = row.copy()
+                row.setflags(write=False)
+                self._store(key, row)
+                rows.append(row)
+                futures.append(self.inflight.pop(key, None))
+
+        for future, vector in zip(futures, rows):
+            if future is not None:
+                future.set_result(vector)
+
+    # -----------------------------------------------------------
+    # LangChain embeddings interface
+    # -----------------------------------------------------------
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents (raw strings, no tokenization)"""
+        if not texts:
+            return []
+        return [
+            (r.result() if isinstance(r, Future) else r).tolist()
+            for r in self._lookup(texts)
+        ]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed single query"""
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Async variant: waits on the shared futures without blocking the event loop."""
+        if not texts:
+            return []
+        results = []
+        for r in self._lookup(texts):
+            if isinstance(r, Future):
+                r = await asyncio.wrap_future(r)
+            results.append(r.tolist())
+        return results
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "cached": len(self.cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_rate": round((self.hits + self.coalesced) / lookups, 3) if lookups else 0.0,
+                "requests": self.requests,
+                "avg_batch": round(self.batched_texts / self.requests, 2) if self.requests else 0.0,
+            }
+
+
+class FastAPIEmbeddings(CachedEmbeddings):
+    """
+    Client for the embedding server (OpenAI-compatible /v1/embeddings).
+
+    Vectors travel as packed floats (/v1/embeddings/raw, or base64 via the
+    OpenAI API) and are decoded with numpy.frombuffer. One OpenAI client and
+    one httpx client (connection pools) per instance.
+    """
+
+    def __init__(self, base_url: str, api_key: str = "not-needed",
+                 transport=EMBEDDING_TRANSPORT, wire_dtype=EMBEDDING_WIRE_DTYPE, **kwargs):
+        super().__init__(**kwargs)
+
+        self.base_url = base_url
         self.client = openai.OpenAI(base_url=base_url, api_key=api_key)
+        self.http = httpx.Client(
+            base_url=base_url,
+            headers={"Authorization": f"Bearer {api_key}"},
+            timeout=60.0,
+        )
         self.model = "sentence-transformers/all-MiniLM-L6-v2"
-    
-    def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        """Embed documents - sends RAW strings to FastAPI"""
+
+        if transport not in ("binary", "base64"):
+            print(f"[WARN] Unknown EMBEDDING.TRANSPORT '{transport}', using base64")
+            transport = "base64"
+        if wire_dtype not in WIRE_DTYPES:
+            print(f"[WARN] Unknown EMBEDDING.WIRE_DTYPE '{wire_dtype}', using float32")
+            wire_dtype = "float32"
+        self.transport = transport
+        self.wire_dtype = wire_dtype
+
+    def _fetch(self, texts):
+        if self.transport == "binary":
+            return self._fetch_binary(texts)
+        return self._fetch_base64(texts)
+
+    def _fetch_binary(self, texts):
+        response = self.http.post("embeddings/raw", json={"input": texts, "dtype": self.wire_dtype})
+        if response.status_code in (404, 405):
+            # embedding server without the raw endpoint
+            print("[WARN] Embedding server has no /embeddings/raw, falling back to base64")
+            self.transport = "base64"
+            return self._fetch_base64(texts)
+        response.raise_for_status()
+
+        count = int(response.headers["X-Embedding-Count"])
+        dim = int(response.headers["X-Embedding-Dim"])
+        dtype = WIRE_DTYPES[response.headers.get("X-Embedding-Dtype", self.wire_dtype)]
+        return np.frombuffer(response.content, dtype=dtype).reshape(count, dim)
+
+    def _fetch_base64(self, texts):
         response = self.client.embeddings.create(
             model=self.model,
-            input=texts  # Raw strings, no tokenization
+            input=texts,  # Raw strings, no tokenization
+            encoding_format="base64",
         )
-        return [item.embedding for item in response.data]
-    
-    def embed_query(self, text: str) -> List[float]:
-        """Embed single query"""
-        return self.embed_documents([text])[0]
+        rows = []
+        for item in sorted(response.data, key=lambda d: d.index):
+            if isinstance(item.embedding, str):
+                rows.append(np.frombuffer(base64.b64decode(item.embedding), dtype=WIRE_DTYPES["float32"]))
+            else:
+                rows.append(np.asarray(item.embedding))   # server ignored encoding_format
+        return np.vstack(rows) if rows else np.empty((0, 0))
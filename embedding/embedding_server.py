@@ -1,7 +1,12 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
 from pydantic import BaseModel
-from sentence_transformers import SentenceTransformer
-from typing import List, Any
+from typing import List, Any, Literal
+import numpy as np
+import base64
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import time
 import uvicorn
 import os
 import logging
@@ -12,15 +17,143 @@ logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Embedding Server", version="1.0.0")
 
+try:
+    from embedding.backends import EMBEDDING_MODEL, EMBEDDING_BACKEND, EMBEDDING_THREADS, load_checked_model
+except ImportError:   # run as a script: python embedding/embedding_server.py
+    from backends import EMBEDDING_MODEL, EMBEDDING_BACKEND, EMBEDDING_THREADS, load_checked_model
+
 # Load model (downloads automatically first time)
-MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"  # 384 dims, fast
-# MODEL_NAME = "sentence-transformers/all-mpnet-base-v2"  # 768 dims, better quality
-model = SentenceTransformer(MODEL_NAME)
-logger.info(f"✅ Loaded model: {MODEL_NAME}")
+# EMBEDDING.MODEL / EMBEDDING_MODEL, e.g. sentence-transformers/all-mpnet-base-v2 (768 dims, better quality)
+MODEL_NAME = EMBEDDING_MODEL  # all-MiniLM-L6-v2 by default: 384 dims, fast
+model, BACKEND, SELF_CHECK = load_checked_model(MODEL_NAME, EMBEDDING_BACKEND, EMBEDDING_THREADS)
+logger.info(f"✅ Loaded model: {MODEL_NAME} ({BACKEND})")
+
+# Dynamic batching
+BATCH_WINDOW_MS = float(os.getenv("EMBED_BATCH_WINDOW_MS", 4))    # wait for more requests to join a batch
+MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", 128))                # texts per model.encode call
+ENCODE_BATCH_SIZE = int(os.getenv("EMBED_ENCODE_BATCH_SIZE", 64)) # SentenceTransformer internal batch_size
+
+
+class EmbeddingBatcher:
+    """
+    Collects texts from concurrent requests for BATCH_WINDOW_MS (or until
+    MAX_BATCH texts), encodes them in one model.encode call on a worker
+    thread so the event loop keeps accepting requests, and hands each
+    request its slice of the result.
+    """
+
+    def __init__(self, window_ms=BATCH_WINDOW_MS, max_batch=MAX_BATCH, encode_batch_size=ENCODE_BATCH_SIZE):
+        self.window = window_ms / 1000
+        self.max_batch = max(1, max_batch)
+        self.encode_batch_size = encode_batch_size
+
+        self.queue = None
+        self.task = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="encode")
+
+        self.started_at = time.time()
+        self.requests = 0
+        self.texts = 0
+        self.batches = 0
+        self.encode_seconds = 0.0
+        self.recent = deque(maxlen=256)   # (finished_at, texts) per batch
+
+    def start(self):
+        self.queue = asyncio.Queue()
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+        self.executor.shutdown(wait=False)
+
+    async def embed(self, texts):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((texts, future))
+        return await future
+
+    def _encode(self, texts):
+        return model.encode(texts, batch_size=self.encode_batch_size)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch = [await self.queue.get()]
+            size = len(batch[0][0])
+            deadline = loop.time() + self.window
+
+            while size < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                size += len(item[0])
+
+            texts = [text for item_texts, _ in batch for text in item_texts]
+            start = time.perf_counter()
+            try:
+                vectors = await loop.run_in_executor(self.executor, self._encode, texts)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            elapsed = time.perf_counter() - start
+            self.requests += len(batch)
+            self.texts += len(texts)
+            self.batches += 1
+            self.encode_seconds += elapsed
+            self.recent.append((time.time(), len(texts)))
+
+            offset = 0
+            for item_texts, future in batch:
+                if not future.done():
+                    future.set_result(vectors[offset:offset + len(item_texts)])
+                offset += len(item_texts)
+
+    def metrics(self):
+        now = time.time()
+        last_minute = sum(n for finished, n in self.recent if now - finished <= 60)
+        return {
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "requests": self.requests,
+            "texts": self.texts,
+            "batches": self.batches,
+            "avg_batch": round(self.texts / self.batches, 2) if self.batches else 0.0,
+            "avg_encode_ms": round(self.encode_seconds * 1000 / self.batches, 2) if self.batches else 0.0,
+            "texts_per_sec_1m": round(last_minute / 60, 2),
+            "encode_texts_per_sec": round(self.texts / self.encode_seconds, 2) if self.encode_seconds else 0.0,
+            "uptime_s": round(now - self.started_at, 1),
+        }
+
+
+batcher = EmbeddingBatcher()
+
+@app.on_event("startup")
+async def start_batcher():
+    batcher.start()
+
+@app.on_event("shutdown")
+async def stop_batcher():
+    await batcher.stop()
+
+# Little-endian on the wire, whatever the host byte order
+WIRE_DTYPES = {"float32": np.dtype("<f4"), "float16": np.dtype("<f2")}
 
 class EmbeddingRequest(BaseModel):
     input: List[str]
     model: str = MODEL_NAME
+    encoding_format: Literal["float", "base64"] = "float"
+
+class RawEmbeddingRequest(BaseModel):
+    input: List[str]
+    dtype: Literal["float32", "float16"] = "float32"
 
 class EmbeddingResponse(BaseModel):
     data: List[Any]
@@ -34,10 +167,16 @@ async def create_embeddings(request: EmbeddingRequest):
             raise HTTPException(status_code=400, detail="'input' must not be empty")
         
         texts = [str(text) for text in request.input]
-        print(f"📝 Embedding texts: {texts[:1]}...")  # Debug log
-        
-        embeddings = model.encode(texts).tolist()
-        
+
+        vectors = await batcher.embed(texts)
+
+        if request.encoding_format == "base64":
+            # OpenAI-compatible: each vector as base64 of little-endian float32
+            vectors = np.ascontiguousarray(vectors, dtype=WIRE_DTYPES["float32"])
+            embeddings = [base64.b64encode(row.tobytes()).decode("ascii") for row in vectors]
+        else:
+            embeddings = vectors.tolist()
+
         # ✅ OpenAI EXACT response format
         return {
             "object": "list",
@@ -55,13 +194,49 @@ async def create_embeddings(request: EmbeddingRequest):
                 "total_tokens": len(texts) * 10
             }
         }
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/v1/embeddings/raw")
+async def create_embeddings_raw(request: RawEmbeddingRequest):
+    """
+    Embeddings as one contiguous little-endian (count, dim) array of the
+    requested dtype, for clients that decode with numpy.frombuffer.
+    """
+    try:
+        if not request.input:
+            raise HTTPException(status_code=400, detail="'input' must not be empty")
+
+        texts = [str(text) for text in request.input]
+        vectors = np.ascontiguousarray(await batcher.embed(texts), dtype=WIRE_DTYPES[request.dtype])
+
+        return Response(
+            content=vectors.tobytes(),
+            media_type="application/octet-stream",
+            headers={
+                "X-Embedding-Count": str(vectors.shape[0]),
+                "X-Embedding-Dim": str(vectors.shape[1]),
+                "X-Embedding-Dtype": request.dtype,
+            },
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/health")
 async def health():
-    return {"status": "healthy", "model": MODEL_NAME}
+    return {
+        "status": "healthy",
+        "model": MODEL_NAME,
+        "backend": BACKEND,
+        "self_check": SELF_CHECK,
+        "batching": batcher.metrics(),
+    }
 
 @app.get("/models")
 async def list_models():
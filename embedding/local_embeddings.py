@@ -0,0 +1,63 @@
+# embedding/local_embeddings.py
+
+import threading
+
+from embedding.backends import EMBEDDING_BACKEND, EMBEDDING_MODEL, EMBEDDING_THREADS, load_checked_model
+from embedding.embedding_client import CachedEmbeddings
+
+
+class LocalEmbeddings(CachedEmbeddings):
+    """
+    In-process embedder for single-box setups: the same model and backend
+    options as embedding_server.py, without the HTTP hop.
+
+    The model is loaded on first use (or by load()). Encoding runs on the
+    batch thread from CachedEmbeddings, one batch at a time.
+    """
+
+    def __init__(self, model_name=EMBEDDING_MODEL, backend=EMBEDDING_BACKEND, threads=EMBEDDING_THREADS,
+                 encode_batch_size=64, **kwargs):
+        super().__init__(**kwargs)
+
+        self.model_name = model_name
+        self.backend = backend
+        self.threads = threads
+        self.encode_batch_size = encode_batch_size
+
+        self.model = None
+        self.active_backend = None
+        self.self_check = None
+        self.error = None
+        self.load_lock = threading.Lock()
+
+    def load(self):
+        if self.model is None:
+            with self.load_lock:
+                if self.model is None:
+                    try:
+                        self.model, self.active_backend, self.self_check = load_checked_model(
+                            self.model_name, self.backend, self.threads
+                        )
+                        self.error = None
+                    except Exception as e:
+                        self.error = str(e)
+                        print(f"[ERROR] Failed to load embedding model {self.model_name}: {e}")
+                        raise
+        return self.model
+
+    def status(self):
+        if self.model is not None:
+            return "loaded"
+        return "failed" if self.error else "not loaded"
+
+    def _fetch(self, texts):
+        return self.load().encode(texts, batch_size=self.encode_batch_size)
+
+    def stats(self):
+        return {
+            **super().stats(),
+            "model": self.model_name,
+            "backend": self.active_backend or self.backend,
+            "status": self.status(),
+            "self_check": self.self_check,
+        }
@@ -1,6 +1,7 @@
 import chromadb
 from chromadb.config import Settings
 from langchain_chroma import Chroma
+import threading
 import yaml
 
 _store = None
@@ -10,13 +11,27 @@ _embeddings = None
 with open("config.yaml", "r") as file:
     config = yaml.safe_load(file) or {}
 
+# remote: embedding_server.py over HTTP, local: the model runs inside ATOM
+EMBEDDING_MODE = str((config.get("EMBEDDING", {}) or {}).get("MODE", "remote")).lower()
+if EMBEDDING_MODE not in ("remote", "local"):
+    print(f"[WARN] Unknown EMBEDDING.MODE '{EMBEDDING_MODE}', using remote")
+    EMBEDDING_MODE = "remote"
+
+_embeddings_lock = threading.Lock()
+
 def get_embeddings():
     global _embeddings
     if _embeddings is None:
-        from embedding.embedding_client import FastAPIEmbeddings
-        _embeddings = FastAPIEmbeddings(
-            base_url=config['EMBEDDING_SERVER_BASE_URL']
-        )
+        with _embeddings_lock:
+            if _embeddings is None:
+                if EMBEDDING_MODE == "local":
+                    from embedding.local_embeddings import LocalEmbeddings
+                    _embeddings = LocalEmbeddings()
+                else:
+                    from embedding.embedding_client import FastAPIEmbeddings
+                    _embeddings = FastAPIEmbeddings(
+                        base_url=config['EMBEDDING_SERVER_BASE_URL']
+                    )
     return _embeddings
 
 def get_client():
@@ -1,5 +1,6 @@
 from langchain.agents.middleware import AgentMiddleware
 from langchain.messages import SystemMessage
+from core.prompt_layout import CACHE_FRIENDLY_PROMPT, set_tail_context
 
 import re
 
@@ -229,6 +230,11 @@ class MemoryInjectionMiddleware(AgentMiddleware):
         preview = mem_text[:300].replace("\n", " ")
         print(f"🔍 Memory preview: {preview}...")
 
+        if CACHE_FRIENDLY_PROMPT:
+            # sent at the tail by PromptLayoutMiddleware, history stays untouched
+            set_tail_context("memory", f"Relevant long-term memory:\n{mem_text}")
+            return None
+
         # ---- Build the injected memory message ----
         injected = SystemMessage(
             name="memory_context",
@@ -407,6 +413,11 @@ class JudgedMemoryInjectionMiddleware(AgentMiddleware):
 
         # print(f"✏️ Relevant judged context:\n{mem_text}")
 
+        if CACHE_FRIENDLY_PROMPT:
+            # sent at the tail by PromptLayoutMiddleware, history stays untouched
+            set_tail_context(f"judged:{self.session_id}", f"Relevant judged context:\n{mem_text}")
+            return None
+
         injected = SystemMessage(
             name="memory_context",
             content=f"Relevant judged context:\n{mem_text}"
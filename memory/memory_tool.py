@@ -144,8 +144,8 @@ def write_memory_tool_async(memory_text: str, metadata: dict = None) -> str:
     def background_task():
         print("⚙️ BACKGROUND MEMORY TASK STARTED")
 
-        from core.llm import LLM
-        judge_model = LLM().summary_model
+        from core.llm import get_llm
+        judge_model = get_llm().summary_model
         # print("SUMMARY MODEL =", judge_model)
 
         # ----------------------------------
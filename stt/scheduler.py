@@ -0,0 +1,306 @@
+# stt/scheduler.py
+
+import io
+import math
+import os
+import threading
+import time
+from concurrent.futures import Future
+from queue import Queue, Empty, Full
+import asyncio
+import numpy as np
+
+from stt.whisper_pool import get_whisper_pool, config, WHISPER_MODEL, WHISPER_COMPUTE_TYPE
+
+stt_cfg = config.get("STT", {}) or {}
+
+STT_WORKERS = int(stt_cfg.get("WORKERS", 0)) or (os.cpu_count() or 1)
+STT_QUEUE_SIZE = int(stt_cfg.get("QUEUE_SIZE", 32))
+STT_BATCH_WINDOW_MS = int(stt_cfg.get("BATCH_WINDOW_MS", 50))
+STT_MAX_BATCH = int(stt_cfg.get("MAX_BATCH", 8))
+STT_SHORT_CLIP_SEC = float(stt_cfg.get("SHORT_CLIP_SEC", 10))
+
+SAMPLE_RATE = 16000
+# Whisper's input window; a batched clip must fit in one
+WHISPER_WINDOW_SEC = 30
+
+
+class TranscriptionQueueFull(Exception):
+    """Raised by submit() when the queue is at capacity."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"STT queue full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class _Job:
+    def __init__(self, audio, language, beam_size):
+        self.raw = audio
+        self.audio = None
+        self.language = language
+        self.beam_size = beam_size
+        self.future = Future()
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+
+    @property
+    def duration(self):
+        return len(self.audio) / SAMPLE_RATE
+
+
+class TranscriptionScheduler:
+    """
+    Runs Whisper transcription off the event loop.
+
+    Requests go into a bounded queue drained by a pool of worker threads.
+    Short clips that arrive within `batch_window_ms` of each other are
+    packed into one batched Whisper call; a full queue rejects new work
+    with TranscriptionQueueFull so the API can answer 429.
+    """
+
+    def __init__(
+        self,
+        workers=STT_WORKERS,
+        queue_size=STT_QUEUE_SIZE,
+        batch_window_ms=STT_BATCH_WINDOW_MS,
+        max_batch=STT_MAX_BATCH,
+        short_clip_sec=STT_SHORT_CLIP_SEC,
+        model_size=WHISPER_MODEL,
+        compute_type=WHISPER_COMPUTE_TYPE,
+    ):
+        self.workers = max(1, workers)
+        self.queue = Queue(maxsize=max(1, queue_size))
+        self.batch_window = batch_window_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self.short_clip_sec = min(short_clip_sec, WHISPER_WINDOW_SEC)
+        self.model_size = model_size
+        self.compute_type = compute_type
+
+        # Rolling average of inference seconds, used for Retry-After hints
+        self.avg_inference = 1.0
+        self.lock = threading.Lock()
+
+        self.threads = []
+        for _ in range(self.workers):
+            t = threading.Thread(target=self._worker, daemon=True)
+            t.start()
+            self.threads.append(t)
+
+    # -----------------------------------------------------------
+    # PUBLIC
+    # -----------------------------------------------------------
+    def submit(self, audio, language=None, beam_size=5) -> Future:
+        """
+        Queue encoded audio bytes / file-like / NumPy PCM for transcription.
+        Returns a Future resolving to {"text", "queue_wait_sec", ...}.
+        """
+        job = _Job(audio, language, beam_size)
+        try:
+            self.queue.put_nowait(job)
+        except Full:
+            raise TranscriptionQueueFull(self.retry_after())
+        return job.future
+
+    async def transcribe(self, audio, language=None, beam_size=5) -> dict:
+        return await asyncio.wrap_future(self.submit(audio, language, beam_size))
+
+    def retry_after(self) -> int:
+        backlog = self.queue.qsize() * self.avg_inference / self.workers
+        return max(1, math.ceil(backlog))
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "queue_depth": self.queue.qsize(),
+            "queue_size": self.queue.maxsize,
+            "avg_inference_sec": round(self.avg_inference, 3),
+        }
+
+    def shutdown(self):
+        for _ in self.threads:
+            self.queue.put(None)
+
+    # -----------------------------------------------------------
+    # INTERNAL
+    # -----------------------------------------------------------
+    def _decode(self, job):
+        """Turn the raw payload into 16 kHz float32. False if it failed."""
+        try:
+            if isinstance(job.raw, np.ndarray):
+                from stt.stt import pcm_to_float32
+                job.audio = pcm_to_float32(job.raw)
+            else:
+                from faster_whisper import decode_audio
+                raw = job.raw
+                if isinstance(raw, (bytes, bytearray)):
+                    raw = io.BytesIO(raw)
+                job.audio = decode_audio(raw, sampling_rate=SAMPLE_RATE)
+            return True
+        except Exception as e:
+            job.future.set_exception(e)
+            return False
+
+    def _collect_batch(self, first):
+        """Gather short clips arriving within the batch window."""
+        batch = [first]
+        solo = []
+
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+
+            try:
+                job = self.queue.get(timeout=remaining)
+            except Empty:
+                break
+
+            if job is None:
+                # Keep the shutdown sentinel for the outer loop
+                self.queue.put(None)
+                break
+
+            if not self._decode(job):
+                continue
+
+            same_options = (job.language, job.beam_size) == (first.language, first.beam_size)
+            if job.duration <= self.short_clip_sec and same_options:
+                batch.append(job)
+            else:
+                solo.append(job)
+
+        return batch, solo
+
+    def _worker(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                break
+
+            if not self._decode(job):
+                continue
+
+            if job.duration <= self.short_clip_sec and self.max_batch > 1:
+                batch, solo = self._collect_batch(job)
+            else:
+                batch, solo = [job], []
+
+            self._run(batch)
+            for j in solo:
+                self._run([j])
+
+    def _run(self, batch):
+        try:
+            with get_whisper_pool().acquire(self.model_size, self.compute_type) as model:
+                started = time.monotonic()
+                for job in batch:
+                    job.started_at = started
+
+                if len(batch) == 1:
+                    texts = [self._transcribe_one(model, batch[0])]
+                else:
+                    texts = self._transcribe_batch(model, batch)
+        except Exception as e:
+            for job in batch:
+                if not job.future.done():
+                    job.future.set_exception(e)
+            return
+
+        inference = time.monotonic() - started
+        with self.lock:
+            self.avg_inference = 0.8 * self.avg_inference + 0.2 * inference
+
+        for job, text in zip(batch, texts):
+            job.future.set_result({
+                "text": text,
+                "queue_wait_sec": round(job.started_at - job.submitted_at, 3),
+                "inference_sec": round(inference, 3),
+                "batch_size": len(batch),
+                "audio_sec": round(job.duration, 2),
+            })
+
+    def _transcribe_one(self, model, job):
+        segments, _ = model.transcribe(
+            job.audio,
+            language=job.language,
+            beam_size=job.beam_size,
+        )
+        return " ".join(seg.text for seg in segments)
+
+    def _transcribe_batch(self, model, batch):
+        """
+        Decode every clip as its own batch element: one mel spectrogram per
+        clip, one encoder/decoder pass for the whole batch, and element i's
+        text goes back to job i. Clips are never joined, so a segment can't
+        span two callers.
+        """
+        from faster_whisper import BatchedInferencePipeline
+        from faster_whisper.audio import pad_or_trim
+        from faster_whisper.tokenizer import Tokenizer
+        from faster_whisper.transcribe import TranscriptionOptions, get_suppressed_tokens
+
+        language = batch[0].language
+        # no language given: each element detects its own (multilingual models only)
+        multilingual = language is None and model.model.is_multilingual
+        tokenizer = Tokenizer(
+            model.hf_tokenizer,
+            model.model.is_multilingual,
+            task="transcribe",
+            language=language or "en",
+        )
+
+        # Same options BatchedInferencePipeline.transcribe builds by default
+        options = TranscriptionOptions(
+            beam_size=batch[0].beam_size,
+            best_of=5,
+            patience=1,
+            length_penalty=1,
+            repetition_penalty=1,
+            no_repeat_ngram_size=0,
+            log_prob_threshold=-1.0,
+            no_speech_threshold=0.6,
+            compression_ratio_threshold=2.4,
+            condition_on_previous_text=False,
+            prompt_reset_on_temperature=0.5,
+            temperatures=[0.0],
+            initial_prompt=None,
+            prefix=None,
+            suppress_blank=True,
+            suppress_tokens=get_suppressed_tokens(tokenizer, [-1]),
+            without_timestamps=True,
+            max_initial_timestamp=0.0,
+            word_timestamps=False,
+            prepend_punctuations="\"'“¿([{-",
+            append_punctuations="\"'.。,，!！?？:：”)]}、",
+            multilingual=multilingual,
+            max_new_tokens=None,
+            clip_timestamps=None,
+            hallucination_silence_threshold=None,
+            hotwords=None,
+        )
+
+        features = np.stack([
+            pad_or_trim(model.feature_extractor(job.audio)[..., :-1]) for job in batch
+        ])
+        # timestamps relative to each clip
+        metadata = [{"start_time": 0.0, "end_time": job.duration} for job in batch]
+
+        outputs = BatchedInferencePipeline(model=model).forward(features, tokenizer, metadata, options)
+
+        return [
+            " ".join(seg["text"].strip() for seg in segments).strip()
+            for segments in outputs
+        ]
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_transcription_scheduler():
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = TranscriptionScheduler()
+    return _scheduler
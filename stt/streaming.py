@@ -0,0 +1,178 @@
+# stt/streaming.py
+
+import collections
+import numpy as np
+
+from stt.whisper_pool import get_whisper_pool, config, WHISPER_COMPUTE_TYPE
+from stt.stt import pcm_to_float32
+
+stt_cfg = config.get("STT", {}) or {}
+
+STREAM_MODEL = stt_cfg.get("STREAM_MODEL", "tiny.en")
+STREAM_LANGUAGE = stt_cfg.get("STREAM_LANGUAGE", "en")
+STREAM_PARTIAL_INTERVAL_MS = int(stt_cfg.get("STREAM_PARTIAL_INTERVAL_MS", 300))
+STREAM_SILENCE_SEC = float(stt_cfg.get("STREAM_SILENCE_SEC", 0.7))
+
+SAMPLE_RATE = 16000
+FRAME_MS = 30
+FRAME_BYTES = SAMPLE_RATE * FRAME_MS // 1000 * 2   # 16-bit mono
+PRE_ROLL_FRAMES = 10                                # ~300 ms kept before speech starts
+MIN_UTTERANCE_SEC = 0.3
+
+
+class _OpusDecoder:
+    """Decode raw Opus packets (e.g. from WebCodecs) into 16 kHz int16 PCM."""
+
+    def __init__(self, sample_rate=48000):
+        import av
+
+        self.codec = av.CodecContext.create("opus", "r")
+        self.codec.sample_rate = sample_rate
+        self.codec.layout = "mono"
+        self.resampler = av.AudioResampler(format="s16", layout="mono", rate=SAMPLE_RATE)
+
+    def decode(self, packet: bytes) -> bytes:
+        import av
+
+        out = bytearray()
+        for frame in self.codec.decode(av.Packet(packet)):
+            for resampled in self.resampler.resample(frame):
+                out += resampled.to_ndarray().tobytes()
+        return bytes(out)
+
+
+class StreamingTranscriber:
+    """
+    Incremental speech-to-text for one audio stream.
+
+    Frames are fed as they arrive. webrtcvad (the same VAD RealtimeSTT
+    uses) segments them into utterances; while someone is speaking the
+    growing utterance is re-decoded every `partial_interval_ms` for a
+    cheap partial, and once `silence_sec` of silence follows speech the
+    utterance is handed back for a full-quality final decode.
+    """
+
+    def __init__(
+        self,
+        fmt="pcm",
+        sample_rate=SAMPLE_RATE,
+        model_size=STREAM_MODEL,
+        language=STREAM_LANGUAGE,
+        partial_interval_ms=STREAM_PARTIAL_INTERVAL_MS,
+        silence_sec=STREAM_SILENCE_SEC,
+        vad_sensitivity=3,
+    ):
+        import webrtcvad
+
+        self.fmt = fmt
+        self.sample_rate = sample_rate
+        self.model_size = model_size
+        self.language = language
+        self.partial_every = max(1, partial_interval_ms // FRAME_MS)
+        self.silence_frames = max(1, int(silence_sec * 1000) // FRAME_MS)
+
+        self.vad = webrtcvad.Vad(vad_sensitivity)
+        self.opus = _OpusDecoder(sample_rate) if fmt == "opus" else None
+
+        self.pending = b""
+        self.pre_roll = collections.deque(maxlen=PRE_ROLL_FRAMES)
+        self.utterance = bytearray()
+        self.in_speech = False
+        self.silent_run = 0
+        self.frames_since_partial = 0
+
+        # Bumped on every finished utterance so stale partials can be dropped
+        self.utterance_id = 0
+
+    # -----------------------------------------------------------
+    # AUDIO IN
+    # -----------------------------------------------------------
+    def _to_pcm16k(self, data: bytes) -> bytes:
+        if self.opus is not None:
+            return self.opus.decode(data)
+
+        if self.sample_rate == SAMPLE_RATE:
+            return data
+
+        audio = pcm_to_float32(data, self.sample_rate)
+        return (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
+
+    def feed(self, data: bytes) -> list:
+        """
+        Push one chunk of audio. Returns the finished utterances
+        (float32 arrays) that should be finalized now.
+        """
+        self.pending += self._to_pcm16k(data)
+        finished = []
+
+        while len(self.pending) >= FRAME_BYTES:
+            frame = self.pending[:FRAME_BYTES]
+            self.pending = self.pending[FRAME_BYTES:]
+
+            speech = self.vad.is_speech(frame, SAMPLE_RATE)
+
+            if not self.in_speech:
+                self.pre_roll.append(frame)
+                if speech:
+                    self.in_speech = True
+                    self.silent_run = 0
+                    self.frames_since_partial = 0
+                    self.utterance = bytearray(b"".join(self.pre_roll))
+                    self.pre_roll.clear()
+                continue
+
+            self.utterance += frame
+            self.frames_since_partial += 1
+            self.silent_run = 0 if speech else self.silent_run + 1
+
+            if self.silent_run >= self.silence_frames:
+                utterance = self._close_utterance()
+                if utterance is not None:
+                    finished.append(utterance)
+
+        return finished
+
+    def flush(self):
+        """End of stream: return whatever utterance is still open."""
+        if not self.in_speech:
+            return None
+        return self._close_utterance()
+
+    def _close_utterance(self):
+        audio = bytes(self.utterance)
+        self.utterance = bytearray()
+        self.in_speech = False
+        self.silent_run = 0
+        self.utterance_id += 1
+
+        if len(audio) < MIN_UTTERANCE_SEC * SAMPLE_RATE * 2:
+            return None
+        return pcm_to_float32(audio)
+
+    # -----------------------------------------------------------
+    # DECODING (blocking — call from a worker thread)
+    # -----------------------------------------------------------
+    def partial_due(self) -> bool:
+        return self.in_speech and self.frames_since_partial >= self.partial_every
+
+    def snapshot(self):
+        """Current open utterance for a partial decode, with its id."""
+        self.frames_since_partial = 0
+        return self.utterance_id, pcm_to_float32(bytes(self.utterance))
+
+    def _decode(self, audio, beam_size):
+        with get_whisper_pool().acquire(self.model_size, WHISPER_COMPUTE_TYPE) as model:
+            segments, _ = model.transcribe(
+                audio,
+                language=self.language,
+                beam_size=beam_size,
+                condition_on_previous_text=False,
+            )
+            return " ".join(seg.text.strip() for seg in segments).strip()
+
+    def transcribe_partial(self, audio) -> str:
+        # Greedy decode: fast, good enough to show while still speaking
+        return self._decode(audio, beam_size=1)
+
+    def transcribe_final(self, audio) -> str:
+        return self._decode(audio, beam_size=5)
@@ -1,5 +1,37 @@
 import RealtimeSTT
 import logging
+import io
+import numpy as np
+from stt.whisper_pool import get_whisper_pool, WHISPER_MODEL, WHISPER_COMPUTE_TYPE
+
+WHISPER_SAMPLE_RATE = 16000
+
+def pcm_to_float32(pcm, sample_rate: int = WHISPER_SAMPLE_RATE) -> np.ndarray:
+    """
+    Convert raw PCM (int16 bytes or a NumPy array) into the mono
+    float32 16 kHz array faster-whisper consumes directly.
+    """
+    if isinstance(pcm, (bytes, bytearray, memoryview)):
+        pcm = np.frombuffer(pcm, dtype=np.int16)
+
+    if pcm.ndim > 1:
+        pcm = pcm.mean(axis=1)
+
+    if pcm.dtype == np.int16:
+        audio = pcm.astype(np.float32) / 32768.0
+    else:
+        audio = pcm.astype(np.float32, copy=False)
+
+    # Cheap linear resample for clients that can't capture at 16 kHz
+    if sample_rate != WHISPER_SAMPLE_RATE and len(audio):
+        target_len = int(len(audio) * WHISPER_SAMPLE_RATE / sample_rate)
+        audio = np.interp(
+            np.linspace(0, len(audio) - 1, target_len),
+            np.arange(len(audio)),
+            audio,
+        ).astype(np.float32)
+
+    return audio
 
 class STT:
     def __init__(self, mode = 'normal'):
@@ -70,11 +102,8 @@ class STT:
             return ""
         
     def stt_from_bytes(self, audio_bytes):
-        # Save bytes → temp wav
-        with open("temp.wav", "wb") as f:
-            f.write(audio_bytes)
-
-        return self.recorder_normal.text_from_file("temp.wav")
+        # Decode straight from memory, no temp file
+        return self.transcribe_audio(io.BytesIO(audio_bytes))
 
 
     def shutdown_stt(self):
@@ -100,54 +129,57 @@ class STT:
                 print(f"[WARN] Failed to shutdown STT recorder cleanly: {e}")
     
     def transcribe_for_api(self, audio_bytes):
-        # Save bytes → temp wav
-        with open("temp.wav", "wb") as f:
-            f.write(audio_bytes)
-
-        return self.transcribe_audio()
+        # Each request gets its own in-memory buffer, so concurrent
+        # uploads never share (or overwrite) a file on disk
+        return self.transcribe_audio(io.BytesIO(audio_bytes))
 
     def transcribe_audio(
             self,
         audio_input: str = "temp.wav",
-        model_size: str = "tiny",
+        model_size: str = WHISPER_MODEL,
         language: str = None,
         beam_size: int = 5,
-        without_timestamps: bool = True
+        without_timestamps: bool = True,
+        compute_type: str = WHISPER_COMPUTE_TYPE
     ) -> str:
-        import io
-        from faster_whisper import WhisperModel
-
         """
         `audio_input` can be:
         - a file path (str or Path)
-        - bytes
+        - encoded audio bytes (wav/webm/ogg/...)
         - a file-like object (.read())
+        - a NumPy array of 16 kHz mono PCM (int16 or float32)
         """
 
-        if isinstance(audio_input, (str, bytes)):
+        if isinstance(audio_input, str):
+            input_for_model = audio_input
+        elif isinstance(audio_input, (bytes, bytearray)):
+            input_for_model = io.BytesIO(audio_input)
+        elif isinstance(audio_input, np.ndarray):
+            input_for_model = pcm_to_float32(audio_input)
+        elif isinstance(audio_input, io.BytesIO):
+            audio_input.seek(0)
             input_for_model = audio_input
         elif hasattr(audio_input, "read"):
             data = audio_input.read()
             input_for_model = io.BytesIO(data)
         else:
-            raise ValueError("audio_input must be filepath, bytes, or file-like object")
-
-        # Load model
-        model = WhisperModel(model_size, device="auto", compute_type="auto")
-
-        # Transcribe
-        segments, info = model.transcribe(
-            input_for_model,
-            language=language,
-            beam_size=beam_size,
-        )
-
-        # Build transcript
-        transcript = []
-        for seg in segments:
-            if without_timestamps:
-                transcript.append(seg.text)
-            else:
-                transcript.append(f"[{seg.start:.2f}–{seg.end:.2f}] {seg.text}")
+            raise ValueError("audio_input must be filepath, bytes, file-like object or NumPy array")
+
+        # Borrow a resident model instead of loading one per request.
+        # Segments are lazy, so they must be consumed while the model is held.
+        with get_whisper_pool().acquire(model_size, compute_type) as model:
+            segments, info = model.transcribe(
+                input_for_model,
+                language=language,
+                beam_size=beam_size,
+            )
+
+            # Build transcript
+            transcript = []
+            for seg in segments:
+                if without_timestamps:
+                    transcript.append(seg.text)
+                else:
+                    transcript.append(f"[{seg.start:.2f}–{seg.end:.2f}] {seg.text}")
 
         return " ".join(transcript)
\ No newline at end of file
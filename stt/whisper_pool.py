@@ -0,0 +1,177 @@
+# stt/whisper_pool.py
+
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from queue import Queue
+import yaml
+
+try:
+    with open("config.yaml", "r") as f:
+        config = yaml.safe_load(f) or {}
+except Exception as e:
+    print(f"[ERROR] Failed to load configuration: {e}")
+    config = {}
+
+stt_cfg = config.get("STT", {}) or {}
+
+WHISPER_MODEL = stt_cfg.get("WHISPER_MODEL", "tiny")
+WHISPER_COMPUTE_TYPE = stt_cfg.get("WHISPER_COMPUTE_TYPE", "auto")
+WHISPER_POOL_SIZE = int(stt_cfg.get("WHISPER_POOL_SIZE", 1))
+WHISPER_MAX_MODELS = int(stt_cfg.get("WHISPER_MAX_MODELS", 2))
+WHISPER_MIN_FREE_MB = int(stt_cfg.get("WHISPER_MIN_FREE_MB", 1024))
+
+
+def _free_memory_mb():
+    try:
+        import psutil
+        return psutil.virtual_memory().available / (1024 * 1024)
+    except Exception:
+        return None
+
+
+class _Slot:
+    """All warm instances of one (model_size, compute_type) pair."""
+
+    def __init__(self):
+        self.idle = Queue()
+        self.created = 0
+
+    @property
+    def busy(self):
+        return self.created - self.idle.qsize()
+
+
+class WhisperModelPool:
+    """
+    Process-wide pool of resident faster-whisper models.
+
+    Models are built lazily on first use and kept warm, keyed by
+    (model_size, compute_type). Up to `instances` models exist per key so
+    concurrent requests don't serialize on one model. When more than
+    `max_models` keys are resident, or free RAM drops below `min_free_mb`,
+    the least recently used idle key is evicted.
+    """
+
+    def __init__(
+        self,
+        instances=WHISPER_POOL_SIZE,
+        max_models=WHISPER_MAX_MODELS,
+        min_free_mb=WHISPER_MIN_FREE_MB,
+        device="auto",
+    ):
+        self.instances = max(1, instances)
+        self.max_models = max(1, max_models)
+        self.min_free_mb = min_free_mb
+        self.device = device
+
+        self.lock = threading.Lock()
+        self.slots = OrderedDict()   # (model_size, compute_type) -> _Slot
+
+    def _load(self, model_size, compute_type):
+        from faster_whisper import WhisperModel
+        return WhisperModel(model_size, device=self.device, compute_type=compute_type)
+
+    def _evict(self, keep):
+        """Drop least recently used idle keys. Caller holds self.lock."""
+        for key in list(self.slots.keys()):
+            over_count = len(self.slots) > self.max_models
+            free = _free_memory_mb()
+            low_memory = free is not None and free < self.min_free_mb
+
+            if not over_count and not low_memory:
+                return
+
+            if key == keep or self.slots[key].busy:
+                continue
+
+            self.slots.pop(key)
+            print(f"[STT] Evicted Whisper model {key[0]} ({key[1]})")
+
+    def _slot(self, key):
+        """Slot for key, marked most recently used. Caller holds self.lock."""
+        slot = self.slots.get(key)
+        if slot is None:
+            slot = _Slot()
+            self.slots[key] = slot
+        self.slots.move_to_end(key)
+        return slot
+
+    def _get_slot(self, key):
+        with self.lock:
+            slot = self._slot(key)
+
+            # Reserve a new instance if none are idle and we still have room
+            reserve = slot.idle.empty() and slot.created < self.instances
+            if reserve:
+                slot.created += 1
+                self._evict(keep=key)
+
+        return slot, reserve
+
+    @contextmanager
+    def acquire(self, model_size=WHISPER_MODEL, compute_type=WHISPER_COMPUTE_TYPE):
+        """
+        Check out a warm model for the duration of the `with` block.
+        Blocks if every instance for this key is busy.
+        """
+        key = (model_size, compute_type)
+        slot, reserve = self._get_slot(key)
+
+        if reserve:
+            try:
+                model = self._load(model_size, compute_type)
+            except Exception:
+                with self.lock:
+                    slot.created -= 1
+                raise
+        else:
+            model = slot.idle.get()
+
+        try:
+            yield model
+        finally:
+            slot.idle.put(model)
+
+    def warm_up(self, model_size=WHISPER_MODEL, compute_type=WHISPER_COMPUTE_TYPE):
+        """Build every configured instance for a key ahead of the first request."""
+        key = (model_size, compute_type)
+
+        # Reserve every missing instance up front; idle ones don't count as room
+        with self.lock:
+            slot = self._slot(key)
+            missing = max(0, self.instances - slot.created)
+            slot.created += missing
+            self._evict(keep=key)
+
+        for built in range(missing):
+            try:
+                slot.idle.put(self._load(model_size, compute_type))
+            except Exception:
+                with self.lock:
+                    slot.created -= missing - built
+                raise
+
+        print(f"[STT] Whisper {model_size} ({compute_type}) warm: {slot.created} instance(s)")
+
+    def stats(self):
+        with self.lock:
+            return {
+                f"{size}/{compute}": {
+                    "instances": slot.created,
+                    "busy": slot.busy,
+                }
+                for (size, compute), slot in self.slots.items()
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_whisper_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = WhisperModelPool()
+    return _pool
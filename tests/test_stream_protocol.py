@@ -0,0 +1,64 @@
+# tests/test_stream_protocol.py
+#
+# /api/chat/stream framing: protocol 2 NDJSON frames carry their "type",
+# protocol 1 lines are unchanged. The LLM is replaced by a fixed delta stream.
+# Run from the project root:  python -m pytest tests/test_stream_protocol.py
+
+import asyncio
+import json
+import zlib
+
+from api.routers import stream
+
+
+class FakeLLM:
+    def __init__(self, deltas, fail=False):
+        self.deltas = deltas
+        self.fail = fail
+
+    async def agenerate_chunks(self, user_input, thread_id):
+        for delta in self.deltas:
+            yield delta
+        if self.fail:
+            raise RuntimeError("model went away")
+
+
+def _lines(monkeypatch, deltas, protocol, fail=False):
+    monkeypatch.setattr(stream, "get_llm", lambda: FakeLLM(deltas, fail))
+    monkeypatch.setattr(stream, "CHECKSUM_EVERY", 2)
+    monkeypatch.setattr(stream, "SNAPSHOT_EVERY", 4)
+
+    async def collect():
+        return [json.loads(line) async for line in stream.stream_generator("hi", "t", protocol)]
+
+    return asyncio.run(collect())
+
+
+def test_delta_frames_are_typed(monkeypatch):
+    deltas = ["Hel", "lo ", "wor", "ld", "!"]
+    frames = _lines(monkeypatch, deltas, stream.PROTOCOL_DELTA)
+
+    by_type = {}
+    for frame in frames:
+        by_type.setdefault(frame["type"], []).append(frame)
+
+    assert [f["delta"] for f in by_type["delta"]] == deltas
+    assert [f["seq"] for f in by_type["sync"]] == [2]
+    assert by_type["snapshot"][0]["text"] == "Hello world"
+
+    done = by_type["done"][0]
+    text = "".join(deltas).encode("utf-8")
+    assert frames[-1] is done
+    assert done["bytes"] == len(text) and done["crc32"] == zlib.crc32(text)
+
+
+def test_delta_error_frame_is_typed(monkeypatch):
+    frames = _lines(monkeypatch, ["Hi"], stream.PROTOCOL_DELTA, fail=True)
+
+    assert frames[-1] == {"type": "error", "v": stream.PROTOCOL_DELTA, "error": "model went away"}
+
+
+def test_full_text_lines_unchanged(monkeypatch):
+    frames = _lines(monkeypatch, ["Hel", "lo"], stream.PROTOCOL_FULL)
+
+    assert frames == [{"text": "Hel"}, {"text": "Hello"}, {"done": True}]
@@ -0,0 +1,101 @@
+# tests/test_stt_scheduler.py
+#
+# Batched transcription: clips from different requests packed into one call
+# must each get back only their own text. faster-whisper is replaced by a
+# fake whose transcribe() merges neighbouring clips into one chunk (as the
+# real pipeline may), so joining clips would hand one caller's words to
+# another; forward() decodes each batch element separately.
+# Run from the project root:  python -m pytest tests/test_stt_scheduler.py
+
+import sys
+import types
+from types import SimpleNamespace
+
+import numpy as np
+
+from stt.scheduler import TranscriptionScheduler, _Job, SAMPLE_RATE
+
+WINDOW = 3 * SAMPLE_RATE   # fake encoder window, in samples
+
+
+def _text(audio):
+    # the "words" of a clip are its constant amplitude
+    return f"amp{np.abs(audio).max():.1f}"
+
+
+class FakeBatchedPipeline:
+    batches = []
+
+    def __init__(self, model):
+        self.model = model
+
+    def transcribe(self, audio, clip_timestamps=None, chunk_length=30, **kwargs):
+        # neighbouring clips merged into one chunk of up to chunk_length seconds
+        chunks, current, size = [], [], 0
+        for clip in clip_timestamps:
+            length = clip["end"] - clip["start"]
+            if current and size + length > chunk_length * SAMPLE_RATE:
+                chunks.append(current)
+                current, size = [], 0
+            current.append(clip)
+            size += length
+        chunks.append(current)
+
+        segments = []
+        for chunk in chunks:
+            merged = np.concatenate([audio[c["start"]:c["end"]] for c in chunk])
+            segments.append(SimpleNamespace(
+                start=chunk[0]["start"] / SAMPLE_RATE,
+                end=chunk[-1]["end"] / SAMPLE_RATE,
+                text=_text(merged),
+            ))
+        return iter(segments), None
+
+    def forward(self, features, tokenizer, chunks_metadata, options):
+        assert len(features) == len(chunks_metadata)
+        FakeBatchedPipeline.batches.append(len(features))
+        return [[{"text": " " + _text(element)}] for element in features]
+
+
+def _pad_or_trim(array, length=WINDOW, *, axis=-1):
+    out = np.zeros(array.shape[:-1] + (length,), dtype=array.dtype)
+    n = min(length, array.shape[-1])
+    out[..., :n] = array[..., :n]
+    return out
+
+
+def _fake_faster_whisper(monkeypatch):
+    modules = {
+        "faster_whisper": types.SimpleNamespace(BatchedInferencePipeline=FakeBatchedPipeline),
+        "faster_whisper.audio": types.SimpleNamespace(pad_or_trim=_pad_or_trim),
+        "faster_whisper.tokenizer": types.SimpleNamespace(Tokenizer=lambda *args, **kwargs: None),
+        "faster_whisper.transcribe": types.SimpleNamespace(
+            TranscriptionOptions=lambda **kwargs: SimpleNamespace(**kwargs),
+            get_suppressed_tokens=lambda tokenizer, tokens: tokens,
+        ),
+    }
+    for name, module in modules.items():
+        monkeypatch.setitem(sys.modules, name, module)
+
+
+def _job(amplitude, seconds):
+    job = _Job(None, None, 5)
+    job.audio = np.full(int(seconds * SAMPLE_RATE), amplitude, dtype=np.float32)
+    return job
+
+
+def test_batch_keeps_each_callers_text_separate(monkeypatch):
+    _fake_faster_whisper(monkeypatch)
+    FakeBatchedPipeline.batches = []
+
+    model = SimpleNamespace(
+        model=SimpleNamespace(is_multilingual=True),
+        hf_tokenizer=None,
+        feature_extractor=lambda audio: np.vstack([audio, audio]),   # trailing frame is dropped
+    )
+
+    scheduler = TranscriptionScheduler.__new__(TranscriptionScheduler)   # no worker threads
+    texts = scheduler._transcribe_batch(model, [_job(0.2, 1.3), _job(0.4, 0.6), _job(0.6, 2.1)])
+
+    assert texts == ["amp0.2", "amp0.4", "amp0.6"]
+    assert FakeBatchedPipeline.batches == [3]   # one decode for the whole batch
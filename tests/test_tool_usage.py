@@ -0,0 +1,65 @@
+# tests/test_tool_usage.py
+#
+# ToolUsageMiddleware: every tool call is timed once and counted as failed
+# when it raises, returns an error ToolMessage, or logs success=False itself.
+# Run from the project root:  python -m pytest tests/test_tool_usage.py
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from debug import tool_calls
+
+
+@pytest.fixture(autouse=True)
+def clean_log(monkeypatch):
+    monkeypatch.setattr(tool_calls, "TOOL_CALL_LOG", type(tool_calls.TOOL_CALL_LOG)(maxlen=5))
+    monkeypatch.setattr(tool_calls, "TOOL_STATS", {})
+
+
+def _request(name):
+    return SimpleNamespace(tool_call={"name": name, "args": {}, "id": "call-1"})
+
+
+def test_logged_failure_counts_once():
+    def handler(request):
+        tool_calls.record_tool_call("lights", {"tags": "Home"}, success=False)
+        return SimpleNamespace(status="success")
+
+    tool_calls.ToolUsageMiddleware().wrap_tool_call(_request("lights"), handler)
+
+    stats = tool_calls.get_tool_stats()["lights"]
+    assert (stats["calls"], stats["failures"]) == (1, 1)
+    assert stats["p50_ms"] is not None
+    assert tool_calls.get_tool_log()[0]["metadata"]["success"] is False
+
+
+def test_error_message_and_exception_are_failures():
+    middleware = tool_calls.ToolUsageMiddleware()
+    middleware.wrap_tool_call(_request("search"), lambda request: SimpleNamespace(status="error"))
+
+    def broken(request):
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        middleware.wrap_tool_call(_request("search"), broken)
+
+    async def ok(request):
+        return SimpleNamespace(status="success")
+
+    asyncio.run(middleware.awrap_tool_call(_request("search"), ok))
+
+    stats = tool_calls.get_tool_stats()["search"]
+    assert (stats["calls"], stats["failures"]) == (3, 2)
+    assert stats["failure_rate"] == round(2 / 3, 3)
+
+
+def test_calls_outside_the_middleware_are_counted_from_the_log():
+    for i in range(7):
+        tool_calls.record_tool_call("timer", {"n": i}, success=i != 3)
+
+    page, total = tool_calls.query_tool_log(tool="timer", success=True, limit=2)
+    assert total == 4                       # ring buffer kept the newest 5
+    assert [e["metadata"]["n"] for e in page] == [6, 5]
+    assert tool_calls.get_tool_stats()["timer"]["calls"] == 6
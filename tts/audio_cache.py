@@ -0,0 +1,148 @@
+# tts/audio_cache.py
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+
+from tts.playback import tts_cfg
+
+TTS_CACHE_MAX_MB = float(tts_cfg.get("CACHE_MAX_MB", 64))
+TTS_CACHE_DIR = tts_cfg.get("CACHE_DIR") or None
+TTS_CACHE_MAX_CHARS = int(tts_cfg.get("CACHE_MAX_CHARS", 200))
+
+
+def phrase_key(voice_id: str, text: str) -> str:
+    """Content address for one phrase: (engine + voice, normalized text)."""
+    normalized = " ".join(text.split())
+    return hashlib.blake2b(f"{voice_id}\0{normalized}".encode("utf-8"), digest_size=16).hexdigest()
+
+
+class PhraseCache:
+    """
+    PCM cache for short, frequently spoken phrases.
+
+    Memory tier: LRU of int16 arrays bounded by `max_bytes`.
+    Disk tier (optional): one raw .npy per phrase under `disk_dir`,
+    memory-mapped on load and promoted into the memory tier.
+    """
+
+    def __init__(self, max_bytes, disk_dir=None, max_chars=TTS_CACHE_MAX_CHARS):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.max_chars = max_chars
+
+        self.entries = OrderedDict()   # key -> np.ndarray
+        self.bytes = 0
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def cacheable(self, text: str) -> bool:
+        return bool(text) and len(text) <= self.max_chars
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.npy")
+
+    def _remember(self, key, pcm):
+        """Insert into the memory tier. Caller holds self.lock."""
+        if key in self.entries:
+            self.bytes -= self.entries.pop(key).nbytes
+
+        self.entries[key] = pcm
+        self.bytes += pcm.nbytes
+
+        while self.bytes > self.max_bytes and len(self.entries) > 1:
+            _, old = self.entries.popitem(last=False)
+            self.bytes -= old.nbytes
+
+    def get(self, key):
+        with self.lock:
+            pcm = self.entries.get(key)
+            if pcm is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return pcm
+
+        if self.disk_dir:
+            try:
+                pcm = np.load(self._path(key), mmap_mode="r")
+            except (FileNotFoundError, ValueError, OSError):
+                pcm = None
+
+            if pcm is not None:
+                with self.lock:
+                    self._remember(key, pcm)
+                    self.disk_hits += 1
+                return pcm
+
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, pcm: np.ndarray):
+        if pcm is None or not len(pcm):
+            return
+
+        pcm = np.ascontiguousarray(pcm, dtype=np.int16)
+
+        with self.lock:
+            self._remember(key, pcm)
+
+        if self.disk_dir:
+            try:
+                path = self._path(key)
+                tmp = path + ".tmp"
+                with open(tmp, "wb") as f:
+                    np.save(f, pcm)
+                os.replace(tmp, path)   # never leave a half-written file behind
+            except Exception as e:
+                print(f"[WARN] Failed to write TTS cache entry: {e}")
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "memory_mb": round(self.bytes / (1024 * 1024), 2),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_phrase_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = PhraseCache(
+                    max_bytes=int(TTS_CACHE_MAX_MB * 1024 * 1024),
+                    disk_dir=TTS_CACHE_DIR,
+                )
+    return _cache
+
+
+def synthesize_cached(engine, text: str) -> np.ndarray:
+    """engine.synthesize() behind the phrase cache."""
+    cache = get_phrase_cache()
+
+    if not cache.cacheable(text):
+        return engine.synthesize(text)
+
+    key = phrase_key(engine.voice_id, text)
+    pcm = cache.get(key)
+    if pcm is None:
+        pcm = engine.synthesize(text)
+        cache.put(key, pcm)
+    return pcm
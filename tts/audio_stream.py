@@ -0,0 +1,136 @@
+# tts/audio_stream.py
+
+import asyncio
+import struct
+import numpy as np
+
+from tts.audio_cache import synthesize_cached
+from tts.sentences import SENTENCE_BOUNDARY
+
+MEDIA_TYPES = {
+    "wav": "audio/wav",
+    "ogg": "audio/ogg",
+}
+
+
+def wav_stream_header(sample_rate: int, channels: int = 1, bits: int = 16) -> bytes:
+    """
+    RIFF/WAVE header for a stream of unknown length. The size fields are
+    set to the maximum, which players treat as "read until EOF".
+    """
+    byte_rate = sample_rate * channels * bits // 8
+    block_align = channels * bits // 8
+    unknown = 0xFFFFFFFF
+
+    return (
+        b"RIFF" + struct.pack("<I", unknown) + b"WAVE"
+        + b"fmt " + struct.pack("<IHHIIHH", 16, 1, channels, sample_rate, byte_rate, block_align, bits)
+        + b"data" + struct.pack("<I", unknown)
+    )
+
+
+class _ByteSink:
+    """Write-only file object that hands back whatever was written since the last take()."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+class OggOpusEncoder:
+    """Incremental int16 PCM → Ogg/Opus, via PyAV (already used for Edge decoding)."""
+
+    def __init__(self, sample_rate: int):
+        import av
+
+        self.av = av
+        self.sample_rate = sample_rate
+        self.sink = _ByteSink()
+        self.container = av.open(self.sink, mode="w", format="ogg")
+        self.stream = self.container.add_stream("libopus", rate=48000, layout="mono")
+        self.resampler = av.AudioResampler(format="s16", layout="mono", rate=48000)
+
+    def _mux(self, frames):
+        for frame in frames:
+            for packet in self.stream.encode(frame):
+                self.container.mux(packet)
+
+    def encode(self, pcm: np.ndarray) -> bytes:
+        frame = self.av.AudioFrame.from_ndarray(
+            np.ascontiguousarray(pcm, dtype=np.int16).reshape(1, -1),
+            format="s16",
+            layout="mono",
+        )
+        frame.sample_rate = self.sample_rate
+        self._mux(self.resampler.resample(frame))
+        return self.sink.take()
+
+    def close(self) -> bytes:
+        self._mux(self.resampler.resample(None))
+        for packet in self.stream.encode(None):
+            self.container.mux(packet)
+        self.container.close()
+        return self.sink.take()
+
+
+def split_sentences(text: str):
+    return [s.strip() for s in SENTENCE_BOUNDARY.split(text) if s.strip()]
+
+
+async def stream_speech(engine, text: str, fmt: str = "wav"):
+    """
+    Async generator of encoded audio bytes for already-cleaned `text`.
+
+    Sentences are synthesized in a worker thread, one ahead of the one
+    being sent, and each is emitted as soon as it is ready so clients can
+    start playback after the first sentence.
+    """
+    sentences = split_sentences(text)
+    encoder = OggOpusEncoder(engine.sample_rate) if fmt == "ogg" else None
+
+    if encoder is None:
+        yield wav_stream_header(engine.sample_rate)
+
+    if not sentences:
+        if encoder is not None:
+            yield encoder.close()
+        return
+
+    def synth(sentence):
+        return asyncio.create_task(asyncio.to_thread(synthesize_cached, engine, sentence))
+
+    pending = synth(sentences[0])
+
+    try:
+        for i in range(len(sentences)):
+            pcm = await pending
+
+            # start the next sentence before sending this one
+            if i + 1 < len(sentences):
+                pending = synth(sentences[i + 1])
+
+            if encoder is None:
+                yield np.ascontiguousarray(pcm, dtype=np.int16).tobytes()
+            else:
+                data = encoder.encode(pcm)
+                if data:
+                    yield data
+
+        if encoder is not None:
+            yield encoder.close()
+
+    finally:
+        # client went away mid-stream
+        if not pending.done():
+            pending.cancel()
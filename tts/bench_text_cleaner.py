@@ -0,0 +1,102 @@
+# tts/bench_text_cleaner.py
+#
+# Micro-benchmark for the TTS text normalizer.
+# Run from the project root:  python -m tts.bench_text_cleaner
+
+import re
+import time
+
+from tts.text_cleaner import clean_for_tts, StreamingCleaner
+
+
+def legacy_clean_for_tts(text: str) -> str:
+    """The old per-engine implementation, kept only for comparison."""
+    text = re.sub(r"```.*?```", "", text, flags=re.DOTALL)
+    text = re.sub(r"`([^`]+)`", r"\1", text)
+    text = re.sub(r"\*\*([^*]+)\*\*", r"\1", text)
+    text = re.sub(r"\*([^*]+)\*", r"\1", text)
+    text = re.sub(r"__([^_]+)__", r"\1", text)
+    text = re.sub(r"_([^_]+)_", r"\1", text)
+    text = re.sub(r"~~([^~]+)~~", r"\1", text)
+    text = re.sub(r"^#{1,6}\s*", "", text, flags=re.MULTILINE)
+    text = re.sub(r"^\s*>+\s*", "", text, flags=re.MULTILINE)
+
+    def bullet_to_sentence(match):
+        item = match.group(1).strip()
+        if not item.endswith(('.', '!', '?')):
+            item += '.'
+        return item
+
+    text = re.sub(r"^\s*[•\-\*]\s+(.*)$", bullet_to_sentence, text, flags=re.MULTILINE)
+    text = re.sub(r"^\s*\d+\.\s+(.*)$", bullet_to_sentence, text, flags=re.MULTILINE)
+    text = re.sub(r"^-{3,}$", "", text, flags=re.MULTILINE)
+    text = re.sub(r"\[([^\]]+)\]\([^\)]+\)", r"\1", text)
+    text = re.sub(r"!\[([^\]]*)\]\([^\)]+\)", r"\1", text)
+    text = re.sub(r"<[^>]+>", "", text)
+
+    emoji_pattern = re.compile(
+        "["
+        "\U0001F600-\U0001F64F"
+        "\U0001F300-\U0001F5FF"
+        "\U0001F680-\U0001F6FF"
+        "\U0001F1E0-\U0001F1FF"
+        "\U00002700-\U000027BF"
+        "\U00002600-\U000026FF"
+        "]+",
+        flags=re.UNICODE
+    )
+    text = emoji_pattern.sub("", text)
+    text = re.sub(r"\n{2,}", "\n", text)
+    return text.strip()
+
+
+SECTION = """## Step {n}: Configure the **service**
+
+Here is what you need to know about `config.yaml` and the [docs](https://example.com/docs) 🚀.
+> Note: this *really* matters for ~~old~~ new installs.
+
+- Install the package with `pip install atom`
+- Restart the <b>server</b>
+1. Open the dashboard
+2. Check the logs!
+
+```python
+print("hello world")
+```
+
+That's it. The value is 3.14 and everything should work. Let me know if anything breaks!
+"""
+
+REPLY = "\n".join(SECTION.format(n=i) for i in range(20))   # ~ a long markdown reply
+SENTENCES = max(1, len(re.findall(r"[.!?](\s|$)", REPLY)))
+
+
+def bench(fn, runs):
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    return (time.perf_counter() - start) / runs
+
+
+def stream_clean():
+    cleaner = StreamingCleaner()
+    out = []
+    # feed in ~4 character deltas like an LLM token stream
+    for i in range(0, len(REPLY), 4):
+        out.append(cleaner.feed(REPLY[i:i + 4]))
+    out.append(cleaner.flush())
+    return "".join(out)
+
+
+if __name__ == "__main__":
+    runs = 200
+
+    results = {
+        "legacy (sequential re.sub)": bench(lambda: legacy_clean_for_tts(REPLY), runs),
+        "clean_for_tts (single pass)": bench(lambda: clean_for_tts(REPLY), runs),
+        "StreamingCleaner (4-char deltas)": bench(stream_clean, runs),
+    }
+
+    print(f"Reply: {len(REPLY)} chars, ~{SENTENCES} sentences, {runs} runs\n")
+    for name, seconds in results.items():
+        print(f"{name:36s} {seconds * 1e3:8.3f} ms/reply  {seconds / SENTENCES * 1e6:8.2f} µs/sentence")
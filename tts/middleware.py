@@ -1,24 +1,94 @@
+import threading
+
 from langchain.agents.middleware import AgentMiddleware, wrap_tool_call
 from tts.voice import voiceEngine
 
+
+def _thread_id():
+    try:
+        from langgraph.config import get_config
+        return str(get_config()["configurable"].get("thread_id", ""))
+    except Exception:
+        return ""
+
+
 class TTSMiddleware(AgentMiddleware):
+    """
+    Speaks model replies through the active voice engine.
+
+    When the caller streams tokens (LLM.generate_chunks), each delta is
+    pushed into the engine's sentence chunker via on_delta(), so the first
+    sentence is spoken while the rest is still generating. after_model then
+    only flushes the tail. Non-streaming callers (agent.invoke) fall back to
+    queueing the whole message once the model finishes.
+
+    The agent is shared, so "already streamed" is tracked per thread id and
+    reset for every model call; each thread also gets its own sentence
+    buffer in the engine. Turns that call tools are not spoken.
+    """
+
     def __init__(self, engine = voiceEngine):
         self.tts = engine
+        self.streamed = set()      # thread ids whose current model call was streamed
+        self.tool_turns = set()    # thread ids whose current model call is calling tools
+        self.lock = threading.Lock()
+
+    def on_delta(self, text, thread_id="", tool_call=False):
+        """One streamed chunk; tool_call=True if it carries tool-call chunks."""
+        from tts.voice import voiceEngine
+        self.tts = voiceEngine
+
+        thread_id = str(thread_id or "")
+
+        with self.lock:
+            if tool_call:
+                self.tool_turns.add(thread_id)
+            if thread_id in self.tool_turns:
+                return
+            if not voiceEngine or not text:
+                return
+            self.streamed.add(thread_id)
+
+        self.tts.push_text(text, stream=thread_id)
+
+    def before_model(self, state, runtime):
+        thread_id = _thread_id()
+        with self.lock:
+            self.streamed.discard(thread_id)
+            self.tool_turns.discard(thread_id)
 
     def after_model(self, state, runtime):
         from tts.voice import voiceEngine
         self.tts = voiceEngine
 
+        thread_id = _thread_id()
+        with self.lock:
+            streamed = thread_id in self.streamed
+            self.streamed.discard(thread_id)
+            self.tool_turns.discard(thread_id)
+
         if not voiceEngine:
             return   # TTS not ready yet, just skip safely
 
         latest_message = state["messages"][-1]
 
+        # Intermediate tool-calling turn: say nothing, drop any partial sentence
+        if getattr(latest_message, "tool_calls", None):
+            if streamed:
+                self.tts.discard(stream=thread_id)
+            return
+
+        # Deltas already went to the engine, just speak the leftover
+        if streamed:
+            self.tts.flush(stream=thread_id)
+            return
+
         if not latest_message.content:
             return
-        
-        # send text to TTS queue (safe & sequential)
-        self.tts.text_queue.put(latest_message.content)
+
+        # send text to TTS queue (cleaned + split into sentences)
+        self.tts.push_text(latest_message.content, stream=thread_id)
+        self.tts.flush(stream=thread_id)
 
     @wrap_tool_call
     def silence_during_tool(request, handler):
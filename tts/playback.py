@@ -0,0 +1,153 @@
+# tts/playback.py
+
+import threading
+import numpy as np
+import sounddevice as sd
+import yaml
+
+try:
+    with open("config.yaml", "r") as f:
+        config = yaml.safe_load(f) or {}
+except Exception as e:
+    print(f"[ERROR] Failed to load configuration: {e}")
+    config = {}
+
+tts_cfg = config.get("TTS", {}) or {}
+
+# Sentences synthesized ahead of the one currently being buffered for playback
+TTS_LOOKAHEAD = int(tts_cfg.get("LOOKAHEAD_SENTENCES", 3))
+# Seconds of audio the playback ring buffer can hold
+TTS_BUFFER_SECONDS = float(tts_cfg.get("BUFFER_SECONDS", 10))
+# Silence kept at each sentence edge when joining sentences
+TTS_JOIN_PAUSE_MS = int(tts_cfg.get("JOIN_PAUSE_MS", 120))
+
+# Marks the end of one sentence in an engine's audio_queue
+END_OF_SENTENCE = object()
+
+
+def trim_silence(pcm: np.ndarray, sample_rate: int, keep_ms=TTS_JOIN_PAUSE_MS,
+                 leading=True, trailing=True, threshold=300):
+    """
+    Cut leading/trailing near-silence down to `keep_ms`, so consecutive
+    sentences join with a natural pause instead of the engine's padding.
+    """
+    if not len(pcm):
+        return pcm
+
+    loud = np.flatnonzero(np.abs(pcm) > threshold)
+    if not len(loud):
+        return pcm[:0] if leading and trailing else pcm
+
+    keep = int(sample_rate * keep_ms / 1000)
+    start = max(0, loud[0] - keep) if leading else 0
+    end = min(len(pcm), loud[-1] + keep) if trailing else len(pcm)
+    return pcm[start:end]
+
+
+class AudioRingBuffer:
+    """
+    Fixed-size int16 ring buffer between the synthesis side and the
+    sounddevice callback. write() blocks while full (backpressure);
+    read() never blocks and pads with silence on underrun.
+    """
+
+    def __init__(self, capacity: int):
+        self.buffer = np.zeros(capacity, dtype=np.int16)
+        self.capacity = capacity
+        self.read_pos = 0
+        self.size = 0
+        self.cond = threading.Condition()
+
+    def write(self, pcm: np.ndarray):
+        pcm = pcm.reshape(-1)
+        offset = 0
+
+        while offset < len(pcm):
+            with self.cond:
+                while self.size == self.capacity:
+                    self.cond.wait()
+
+                n = min(len(pcm) - offset, self.capacity - self.size)
+                write_pos = (self.read_pos + self.size) % self.capacity
+                first = min(n, self.capacity - write_pos)
+
+                self.buffer[write_pos:write_pos + first] = pcm[offset:offset + first]
+                self.buffer[:n - first] = pcm[offset + first:offset + n]
+
+                self.size += n
+                offset += n
+
+    def read(self, out: np.ndarray):
+        with self.cond:
+            n = min(len(out), self.size)
+            first = min(n, self.capacity - self.read_pos)
+
+            out[:first] = self.buffer[self.read_pos:self.read_pos + first]
+            out[first:n] = self.buffer[:n - first]
+            out[n:] = 0
+
+            self.read_pos = (self.read_pos + n) % self.capacity
+            self.size -= n
+            self.cond.notify_all()
+
+    def wait_empty(self):
+        with self.cond:
+            while self.size:
+                self.cond.wait()
+
+
+class GaplessPlayer:
+    """
+    One continuous OutputStream fed from a ring buffer, so sentences
+    play back to back without sd.play()/sd.wait() gaps between them.
+    """
+
+    def __init__(self, sample_rate: int, buffer_seconds=TTS_BUFFER_SECONDS):
+        self.sample_rate = sample_rate
+        self.ring = AudioRingBuffer(int(sample_rate * buffer_seconds))
+        self.stream = sd.OutputStream(
+            samplerate=sample_rate,
+            channels=1,
+            dtype="int16",
+            callback=self._callback,
+        )
+        self.stream.start()
+
+    def _callback(self, outdata, frames, time_info, status):
+        self.ring.read(outdata[:, 0])
+
+    def write(self, pcm: np.ndarray):
+        self.ring.write(pcm)
+
+    def drain(self):
+        self.ring.wait_empty()
+
+    def close(self):
+        self.drain()
+        self.stream.stop()
+        self.stream.close()
+
+
+def play_worker(engine):
+    """
+    Shared playback loop for the TTS engines.
+
+    Moves PCM from engine.audio_queue into a GaplessPlayer and releases
+    one engine.lookahead slot per finished sentence, which lets the
+    synthesis worker stay up to TTS_LOOKAHEAD sentences ahead.
+    """
+    player = GaplessPlayer(engine.sample_rate)
+
+    while True:
+        pcm = engine.audio_queue.get()
+
+        if pcm is None:
+            break
+
+        if pcm is END_OF_SENTENCE:
+            engine.lookahead.release()
+            continue
+
+        player.write(pcm)
+
+    player.close()
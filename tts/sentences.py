@@ -0,0 +1,96 @@
+# tts/sentences.py
+
+import re
+
+from tts.text_cleaner import StreamingCleaner
+
+# Split after sentence punctuation followed by whitespace, or on newlines.
+# Requiring the whitespace keeps "3.14" or "e.g." mid-stream from being cut
+# before the next token arrives.
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?;:])\s+|\n+")
+
+
+class _SentenceStream:
+    """Partial sentence + cleaner state of one named stream."""
+
+    def __init__(self):
+        self.buffer = ""
+        self.cleaner = StreamingCleaner()
+
+
+class SentenceStreamMixin:
+    """
+    Sentence chunking shared by the TTS engines.
+
+    Expects `self.buffer` (str), `self.cleaner` (StreamingCleaner) and
+    `self.text_queue` (Queue) on the engine.
+    push_text() can be fed raw LLM deltas: they are cleaned incrementally,
+    and every complete sentence is queued for synthesis as soon as it closes.
+
+    Concurrent replies pass a `stream` key (e.g. the thread id) so their
+    partial sentences are kept apart; stream=None uses the engine's own
+    buffer and cleaner.
+    """
+
+    def _stream_state(self, stream):
+        if stream is None:
+            return self
+        streams = self.__dict__.setdefault("_streams", {})
+        return streams.setdefault(stream, _SentenceStream())
+
+    # -----------------------------------------------------------
+    # PUBLIC: Push streaming text (this is called from LLM loop)
+    # -----------------------------------------------------------
+    def push_text(self, text_chunk, stream=None):
+        """
+        Accept raw delta tokens from the LLM
+        and convert them into full sentences.
+        """
+        if not text_chunk:
+            return
+
+        state = self._stream_state(stream)
+        state.buffer += state.cleaner.feed(text_chunk)
+
+        parts = SENTENCE_BOUNDARY.split(state.buffer)
+
+        # Send complete sentences to TTS
+        for s in parts[:-1]:
+            clean = s.strip()
+            if clean:
+                self.text_queue.put(clean)
+
+        # Keep the leftover partial sentence
+        state.buffer = parts[-1]
+
+    # -----------------------------------------------------------
+    # PUBLIC: end of one reply, keep the workers running
+    # -----------------------------------------------------------
+    def flush(self, stream=None):
+        state = self._stream_state(stream)
+        leftover = (state.buffer + state.cleaner.flush()).strip()
+        state.buffer = ""
+        if stream is not None:
+            self._streams.pop(stream, None)
+
+        if leftover:
+            self.text_queue.put(leftover)
+
+    # -----------------------------------------------------------
+    # PUBLIC: drop a partial sentence without speaking it
+    # -----------------------------------------------------------
+    def discard(self, stream=None):
+        state = self._stream_state(stream)
+        state.buffer = ""
+        state.cleaner.flush()
+        if stream is not None:
+            self._streams.pop(stream, None)
+
+    # -----------------------------------------------------------
+    # PUBLIC: call at the end to flush leftover text and stop
+    # -----------------------------------------------------------
+    def finish(self):
+        self.flush()
+
+        self.text_queue.put(None)
+        self.running = False
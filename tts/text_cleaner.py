@@ -0,0 +1,206 @@
+# tts/text_cleaner.py
+
+import re
+
+# -----------------------------------------------------------
+# Precompiled patterns (built once at import, not per call)
+# -----------------------------------------------------------
+
+EMOJI = (
+    "\U0001F600-\U0001F64F"  # emoticons
+    "\U0001F300-\U0001F5FF"  # symbols & pictographs
+    "\U0001F680-\U0001F6FF"  # transport & map
+    "\U0001F1E0-\U0001F1FF"  # flags
+    "\U00002700-\U000027BF"  # dingbats
+    "\U00002600-\U000026FF"  # misc symbols
+)
+
+# Inline constructs. Group numbers matter: match.lastindex picks the
+# text to keep, no group means "drop the whole match".
+INLINE_PATTERNS = (
+    r"```.*?```"                        # same-line code fence → drop
+    r"|`([^`]+)`"                       # 1 inline code
+    r"|\*\*([^*]+)\*\*"                 # 2 bold
+    r"|__([^_]+)__"                     # 3 bold
+    r"|~~([^~]+)~~"                     # 4 strikethrough
+    r"|\*([^*]+)\*"                     # 5 italic
+    r"|_(?<!\w_)([^_]+)_(?!\w)"         # 6 italic, but not snake_case
+    r"|!\[([^\]]*)\]\([^\)]+\)"          # 7 images: keep alt text
+    r"|\[([^\]]+)\]\([^\)]+\)"           # 8 links: keep anchor text
+    r"|<[^>]+>"                         # html tags
+    r"|[" + EMOJI + r"]+"
+)
+
+# Line-level constructs, anchored on the preceding "\n" (the text is
+# cleaned with a "\n" prepended) rather than ^, which keeps the leading
+# lookahead usable as a fast first-character filter.
+LINE_PATTERNS = (
+    r"\n[ \t]*```.*?(?:\n[ \t]*```[^\n]*|$)"                    # fenced block → drop
+    r"|\n[ \t]*(?:-{3,}|\*{3,}|_{3,})[ \t]*(?=\n|$)"             # horizontal rule → drop
+    r"|\n[ \t]*(?:>+[ \t]*)*(?:[•\-\*]|\d+\.)[ \t]+([^\n]*)"      # 9 list item → sentence
+    r"|\n[ \t]*(?:>+[ \t]*)*#{1,6}[ \t]*()"                       # 10 heading
+    r"|\n[ \t]*(?:>+[ \t]*)+()"                                  # 11 blockquote
+    r"|\n[ \t]*(?=\n)"                                            # blank line → collapse
+)
+
+FIRST_CHARS = r"[`*_~!\[<\n" + EMOJI + r"]"
+
+INLINE = re.compile(r"(?=" + FIRST_CHARS + r")(?:" + INLINE_PATTERNS + r")", re.DOTALL)
+MARKDOWN = re.compile(
+    r"(?=" + FIRST_CHARS + r")(?:" + INLINE_PATTERNS + r"|" + LINE_PATTERNS + r")",
+    re.DOTALL,
+)
+
+LIST_ITEM_GROUP = 9
+PREFIX_GROUP = 10
+
+# Line prefixes for the streaming cleaner
+PREFIX = re.compile(r"^[ \t]*(?:>+[ \t]*)*(?:#{1,6}[ \t]*)?")
+LIST_ITEM = re.compile(r"^[ \t]*(?:>+[ \t]*)*(?:[•\-\*]|\d+\.)[ \t]+")
+
+# Sentence end inside a line (punctuation + whitespace)
+SENTENCE_END = re.compile(r"[.!?;:]\s+")
+WHITESPACE = re.compile(r"\s")
+
+
+def _end_sentence(item: str) -> str:
+    item = item.strip()
+    if item and not item.endswith(('.', '!', '?')):
+        item += '.'
+    return item
+
+
+def _repl(match):
+    group = match.lastindex
+    if group is None:
+        return ""                      # dropped construct
+    if group >= PREFIX_GROUP:
+        return "\n"                    # heading / blockquote marker
+
+    inner = INLINE.sub(_repl, match.group(group))   # nested, e.g. **bold `code`**
+    if group == LIST_ITEM_GROUP:
+        return "\n" + _end_sentence(inner)
+    return inner
+
+
+def clean_inline(text: str) -> str:
+    return INLINE.sub(_repl, text)
+
+
+def clean_for_tts(text: str) -> str:
+    """
+    Strip markdown, code, html and emoji from an LLM reply so only
+    speakable text reaches the TTS engine. One regex sweep over the text.
+    """
+    return MARKDOWN.sub(_repl, "\n" + text).strip()
+
+
+def _is_fence(line: str) -> bool:
+    # an odd number of ``` on a line opens or closes a block
+    return line.lstrip().startswith("```") and line.count("```") % 2 == 1
+
+
+class StreamingCleaner:
+    """
+    Incremental clean_for_tts for LLM deltas.
+
+    feed() returns the cleaned text that is final so far: whole lines, plus
+    complete sentences of the current line once their inline markup is
+    balanced. Everything else is held back until more text arrives.
+    """
+
+    def __init__(self):
+        self.pending = ""          # raw text of the unfinished line
+        self.in_fence = False
+        self.line_started = False  # line prefix already stripped
+        self.list_item = False
+
+    def feed(self, delta: str) -> str:
+        if not delta:
+            return ""
+
+        self.pending += delta
+
+        # a sentence or line can only close on whitespace
+        if not WHITESPACE.search(delta):
+            return ""
+
+        out = []
+
+        while "\n" in self.pending:
+            line, self.pending = self.pending.split("\n", 1)
+            out.append(self._finish_line(line))
+
+        out.append(self._partial())
+        return "".join(out)
+
+    def flush(self) -> str:
+        line, self.pending = self.pending, ""
+        text = self._finish_line(line)
+        self.in_fence = False
+        return text
+
+    def _finish_line(self, line: str) -> str:
+        started, is_item = self.line_started, self.list_item
+        self.line_started = False
+        self.list_item = False
+
+        if not started:
+            if _is_fence(line):
+                self.in_fence = not self.in_fence
+                return ""
+            if self.in_fence:
+                return ""
+            line = clean_for_tts(line)
+            return line + "\n" if line else ""
+
+        rest = clean_inline(line)
+        if is_item:
+            rest = _end_sentence(rest) if rest.strip() else ""
+        return rest.strip() + "\n" if rest.strip() else "\n"
+
+    def _partial(self) -> str:
+        if self.in_fence:
+            return ""
+
+        if not self.line_started:
+            head = self.pending.lstrip()
+            # might still become a ``` fence
+            if head.startswith("`") and len(head) < 3 or head.startswith("```"):
+                return ""
+
+        # emit up to the last sentence end whose markup is balanced
+        end = 0
+        for m in reversed(list(SENTENCE_END.finditer(self.pending))):
+            candidate = self.pending[:m.end()]
+            if not self.line_started:
+                candidate = LIST_ITEM.sub("", PREFIX.sub("", candidate, count=1), count=1)
+            if _balanced(candidate):
+                end = m.end()
+                break
+        if not end:
+            return ""
+
+        chunk, self.pending = self.pending[:end], self.pending[end:]
+
+        if not self.line_started:
+            self.line_started = True
+            chunk = PREFIX.sub("", chunk, count=1)
+            item = LIST_ITEM.match(chunk)
+            if item:
+                self.list_item = True
+                chunk = chunk[item.end():]
+
+        return clean_inline(chunk)
+
+
+def _balanced(text: str) -> bool:
+    """True if no inline construct is left open at the end of `text`."""
+    return (
+        text.count("`") % 2 == 0
+        and text.count("*") % 2 == 0
+        and text.count("~~") % 2 == 0
+        and text.rfind("[") <= text.rfind("]")
+        and text.rfind("](") <= text.rfind(")")
+        and text.rfind("<") <= text.rfind(">")
+    )
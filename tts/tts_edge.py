@@ -3,95 +3,106 @@ import subprocess
 import threading
 import numpy as np
 from queue import Queue, Empty
-import re
 import edge_tts
 import sounddevice as sd
 import soundfile as sf
-
-class TTS:
+from tts.sentences import SentenceStreamMixin
+from tts.text_cleaner import clean_for_tts, StreamingCleaner
+from tts.audio_cache import get_phrase_cache, phrase_key
+from tts.playback import play_worker, trim_silence, END_OF_SENTENCE, TTS_LOOKAHEAD
+
+# Edge-TTS default output: audio-24khz-48kbitrate-mono-mp3
+EDGE_SAMPLE_RATE = 24000
+
+class MP3StreamDecoder:
+    """
+    Incremental in-memory MP3 → int16 PCM decoder.
+    Feed it the chunks Communicate.stream() yields, get PCM back as soon
+    as whole MP3 frames are available.
+    """
+
+    def __init__(self, sample_rate=EDGE_SAMPLE_RATE):
+        import av
+
+        self.codec = av.CodecContext.create("mp3", "r")
+        self.resampler = av.AudioResampler(format="s16", layout="mono", rate=sample_rate)
+
+    def _decode(self, packets):
+        out = []
+        for packet in packets:
+            for frame in self.codec.decode(packet):
+                for resampled in self.resampler.resample(frame):
+                    out.append(resampled.to_ndarray().reshape(-1))
+
+        if not out:
+            return np.zeros(0, dtype=np.int16)
+        return np.concatenate(out)
+
+    def feed(self, data: bytes) -> np.ndarray:
+        return self._decode(self.codec.parse(data))
+
+    def flush(self) -> np.ndarray:
+        # A None packet drains frames still held by the decoder
+        return self._decode(self.codec.parse(b"") + [None])
+
+class TTS(SentenceStreamMixin):
     def __init__(self):
+        self.sample_rate = EDGE_SAMPLE_RATE
 
         # Queues
         self.text_queue = Queue()
         self.audio_queue = Queue()
+        # Sentences allowed to be synthesized ahead of playback
+        self.lookahead = threading.BoundedSemaphore(TTS_LOOKAHEAD)
 
-        # Start background workers
+        # Buffer for sentence aggregation (see SentenceStreamMixin)
+        self.buffer = ""
+        self.cleaner = StreamingCleaner()
+        self.VOICE = "en-US-AvaNeural"
+        self.cache = get_phrase_cache()
+
+        # Start background workers (after everything they read is set)
         self.running = True
         threading.Thread(target=self._tts_worker, daemon=True).start()
         threading.Thread(target=self._play_worker, daemon=True).start()
 
-        # Buffer for sentence aggregation
-        self.buffer = ""
-        # Sentence boundary regex
-        self.boundary = re.compile(r"[.!?;:\n]")
-        self.VOICE = "en-US-AvaNeural"
+    @property
+    def voice_id(self):
+        # identifies this engine + voice in the phrase cache
+        return f"edge:{self.VOICE}"
 
     def clean_for_tts(self, text: str) -> str:
-        # remove code fences
-        text = re.sub(r"```.*?```", "", text, flags=re.DOTALL)
-        
-        # remove inline code
-        text = re.sub(r"`([^`]+)`", r"\1", text)
-
-        # remove styling
-        text = re.sub(r"\*\*([^*]+)\*\*", r"\1", text)
-        text = re.sub(r"\*([^*]+)\*", r"\1", text)
-        text = re.sub(r"__([^_]+)__", r"\1", text)
-        text = re.sub(r"_([^_]+)_", r"\1", text)
-        text = re.sub(r"~~([^~]+)~~", r"\1", text)
-
-        # remove headings
-        text = re.sub(r"^#{1,6}\s*", "", text, flags=re.MULTILINE)
-
-        # remove blockquotes
-        text = re.sub(r"^\s*>+\s*", "", text, flags=re.MULTILINE)
-
-        # convert bullets into pauses
-        def bullet_to_sentence(match):
-            item = match.group(1).strip()
-            if not item.endswith(('.', '!', '?')):
-                item += '.'
-            return item
-
-        text = re.sub(r"^\s*[•\-\*]\s+(.*)$", bullet_to_sentence, text, flags=re.MULTILINE)
-
-        # numbered lists
-        text = re.sub(r"^\s*\d+\.\s+(.*)$", bullet_to_sentence, text, flags=re.MULTILINE)
-
-        # remove horizontal rules
-        text = re.sub(r"^-{3,}$", "", text, flags=re.MULTILINE)
-
-        # convert links but keep anchor text
-        text = re.sub(r"\[([^\]]+)\]\([^\)]+\)", r"\1", text)
-
-        # images
-        text = re.sub(r"!\[([^\]]*)\]\([^\)]+\)", r"\1", text)
-
-        # remove html tags
-        text = re.sub(r"<[^>]+>", "", text)
-
-        emoji_pattern = re.compile(
-            "[" 
-            "\U0001F600-\U0001F64F"  # emoticons
-            "\U0001F300-\U0001F5FF"  # symbols & pictographs
-            "\U0001F680-\U0001F6FF"  # transport & map
-            "\U0001F1E0-\U0001F1FF"  # flags
-            "\U00002700-\U000027BF"  # dingbats
-            "\U00002600-\U000026FF"  # misc symbols
-            "]+",
-            flags=re.UNICODE
-        )
+        return clean_for_tts(text)
+
+    def stream_pcm(self, text):
+        """
+        Yield int16 PCM chunks for `text` while Edge is still synthesizing.
+        Nothing touches the disk.
+        """
+        decoder = MP3StreamDecoder(self.sample_rate)
+
+        for chunk in edge_tts.Communicate(text, self.VOICE).stream_sync():
+            if chunk["type"] != "audio":
+                continue
 
-        text = emoji_pattern.sub("", text)
+            pcm = decoder.feed(chunk["data"])
+            if len(pcm):
+                yield pcm
 
-        # collapse multi-line
-        text = re.sub(r"\n{2,}", "\n", text)
+        pcm = decoder.flush()
+        if len(pcm):
+            yield pcm
 
-        return text.strip()
+    def synthesize(self, text) -> np.ndarray:
+        """Whole-utterance PCM, in memory."""
+        chunks = list(self.stream_pcm(text))
+        if not chunks:
+            return np.zeros(0, dtype=np.int16)
+        return np.concatenate(chunks)
 
     def text_to_wav(self, llm_output):
-        communicate = edge_tts.Communicate(self.clean_for_tts(llm_output), self.VOICE)
-        communicate.save_sync("tts/output.wav")
+        pcm = self.synthesize(self.clean_for_tts(llm_output))
+        sf.write("tts/output.wav", pcm, self.sample_rate)
 
     def play_wav_nonblocking(self, path = "tts/output.wav"):
         data, samplerate = sf.read(path)
@@ -122,15 +133,43 @@ class TTS:
             if sentence is None:
                 break
 
-            # synth to wav
-            communicate = edge_tts.Communicate(sentence, self.VOICE)
-            communicate.save_sync("tts/output.wav")
+            # text_queue only ever holds cleaned text (push_text and
+            # /api/tts/speak clean before queueing), so no second pass here
+            if not sentence.strip():
+                continue
 
-            # load wav to pcm
-            data, samplerate = sf.read("tts/output.wav", dtype="int16")
+            # wait for a lookahead slot so we stay a bounded number of sentences ahead
+            self.lookahead.acquire()
 
-            self.sample_rate = samplerate
-            self.audio_queue.put(data)
+            # repeated phrases skip the network round-trip entirely
+            key = phrase_key(self.voice_id, sentence)
+            cacheable = self.cache.cacheable(sentence)
+            cached = self.cache.get(key) if cacheable else None
+
+            if cached is not None:
+                self.audio_queue.put(cached)
+                self.audio_queue.put(END_OF_SENTENCE)
+                continue
+
+            # stream MP3 from Edge, decode in memory, play as it arrives
+            try:
+                chunks = []
+                head = None   # leading audio held back until speech starts
+                for pcm in self.stream_pcm(sentence):
+                    if not chunks:
+                        head = pcm if head is None else np.concatenate([head, pcm])
+                        if not len(trim_silence(head, self.sample_rate)):
+                            continue   # still all silence, keep trimming
+                        pcm = trim_silence(head, self.sample_rate, trailing=False)
+                    chunks.append(pcm)
+                    self.audio_queue.put(pcm)
+
+                if cacheable and chunks:
+                    self.cache.put(key, np.concatenate(chunks))
+            except Exception as e:
+                print(f"[ERROR] Edge-TTS synthesis failed: {e}")
+
+            self.audio_queue.put(END_OF_SENTENCE)
 
         self.audio_queue.put(None)
 
@@ -138,11 +177,4 @@ class TTS:
     # BACKGROUND: audio playback worker
     # -----------------------------------------------------------
     def _play_worker(self):
-        while True:
-            pcm = self.audio_queue.get()
-
-            if pcm is None:
-                break
-
-            sd.play(pcm, samplerate=self.sample_rate)
-            sd.wait()
\ No newline at end of file
+        play_worker(self)